@@ -0,0 +1,255 @@
+#Benchmark - file conversie pipeline (Functie 1): tijd per stap, temp I/O, peak RSS, files/min en pitch
+#Pipelines: "wav" (Rubberband CLI), "vocoder" (WAV pipeline met de ingebouwde phase vocoder) en "stream"
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+from scipy.io import wavfile
+import Functie1_Local_File_Converter as converter
+from Benchmark_Realtime_DSP import peak_frequency
+
+try:
+    import resource  # niet beschikbaar op Windows
+except ImportError:
+    resource = None
+
+# Vaste kwaliteit zodat choose_quality niet om input vraagt
+QUALITY_FLAGS = {".wav": [], ".flac": ["-compression_level", "8"], ".mp3": ["-b:a", "320"]}
+
+# Converter instellingen die een case in zijn eigen proces overneemt
+CASE_SETTINGS = ("DB_PATH", "SCRATCH_DIR", "CACHE_ENABLED", "PITCH_BACKEND", "VOCODER_PRESET",
+                 "STREAMING_PIPELINE", "FFMPEG_PATH", "FFPROBE_PATH", "RUBBERBAND_PATH")
+PITCH_WINDOW_SECONDS = 4.0  # stuk uit het midden van de output voor de piekfrequentie (tone)
+
+
+#   --------------------
+#   Test bestanden
+#   --------------------
+def make_signal(kind, seconds, rate=44100, seed=0):
+    """Stereo test signal at 440 Hz reference: a pure tone or a music-like chord sequence."""
+    t = np.arange(int(rate * seconds)) / rate
+    rng = np.random.default_rng(seed)
+    if kind == "tone":
+        mono = 0.5 * np.sin(2 * np.pi * 440.0 * t)
+    elif kind == "music":
+        # Elke seconde een ander akkoord (12-TET t.o.v. 440 Hz), met boventonen en envelope
+        mono = np.zeros_like(t)
+        for second in range(int(np.ceil(seconds))):
+            part = slice(second * rate, (second + 1) * rate)
+            tt = t[part] - second
+            envelope = np.exp(-2.0 * tt)
+            for midi in rng.choice(np.arange(48, 80), 3, replace=False):
+                f = 440.0 * 2 ** ((midi - 69) / 12)
+                for h in range(1, 5):
+                    mono[part] += envelope * np.sin(2 * np.pi * f * h * tt) / (h * 6)
+        mono += 0.005 * rng.standard_normal(len(t))
+    else:
+        raise ValueError(f"Unknown signal: {kind}")
+    return np.stack([mono, 0.9 * mono], axis=1)
+
+def write_input(path, signal, rate=44100):
+    """Write the signal as WAV, or transcode it with ffmpeg for flac/mp3."""
+    pcm = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".wav":
+        wavfile.write(path, rate, pcm)
+        return
+    source = path + ".src.wav"
+    wavfile.write(source, rate, pcm)
+    try:
+        subprocess.run([converter.tool_path("ffmpeg"), "-y", "-v", "error", "-i", source]
+                       + QUALITY_FLAGS[ext] + [path], check=True)
+    finally:
+        os.remove(source)
+
+#   --------------------
+#   Metingen
+#   --------------------
+def peak_rss_mb():
+    """Peak resident memory of this process and of its (ffmpeg/rubberband) children, in MB."""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in KB op Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+def output_pitch_error(output_file, target_hz, kind):
+    """
+    Decode the output and return its pitch error against the target, in cents.
+
+    For "tone" the strongest peak of a window from the middle is compared with
+    target_hz itself, so a whole-semitone error shows up. estimate_tuning
+    folds onto +-50 cents, so for "music" only the fine tuning is checked.
+    """
+    decoded = output_file + ".check.wav"
+    try:
+        if not converter.convert_to_wav(output_file, decoded):
+            return None
+        if kind == "tone":
+            rate, data = converter.open_wav(decoded)
+            window = int(PITCH_WINDOW_SECONDS * rate)
+            start = max(0, (len(data) - window) // 2)
+            mono = np.asarray(data[start:start + window], dtype=np.float64)
+            del data  # mmap loslaten
+            if mono.ndim > 1:
+                mono = mono.mean(axis=1)
+            return float(1200 * np.log2(peak_frequency(mono, rate) / target_hz))
+        detected = converter.estimate_tuning(decoded)
+    finally:
+        if os.path.exists(decoded):
+            os.remove(decoded)
+    return float(1200 * np.log2(detected / converter.tuning_reference_for(target_hz)))
+
+#   --------------------
+#   Benchmark runs
+#   --------------------
+def run_case(settings, bench, *args):
+    """Entry point in the case process: take over the settings, run the case, add its peak RSS."""
+    for name, value in settings.items():
+        setattr(converter, name, value)
+    converter.resolve_tools()  # tool probe niet meetellen in de case
+    result = bench(*args)
+    result["peak_rss_mb"], result["children_peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def run_isolated(bench, *args):
+    """
+    Run one case in a fresh process. ru_maxrss is a lifetime high-water
+    mark, so only a new process gives a per-case peak, for itself and for
+    its ffmpeg/rubberband children.
+    """
+    settings = {name: getattr(converter, name) for name in CASE_SETTINGS}
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, settings, bench, *args).result()
+
+def bench_single(input_file, output_file, target_hz, streaming):
+    """One file through convert_audio_440_to_target."""
+    stats = {}
+    start = time.perf_counter()
+    ok = converter.convert_audio_440_to_target(
+        input_file, output_file, target_hz, QUALITY_FLAGS[os.path.splitext(output_file)[1]],
+        streaming=streaming, stats=stats)
+    wall = time.perf_counter() - start
+    return {
+        "ok": ok,
+        "wall_s": wall,
+        "stages": stats,
+        "output_bytes": os.path.getsize(output_file) if ok else 0,
+    }
+
+def bench_batch(files, target_hz, output_folder, output_ext, workers):
+    """
+    All files through batch_convert_files; reports converted files per
+    minute and the summed stage times (the *_s stats) of converted files.
+    """
+    start = time.perf_counter()
+    results = converter.batch_convert_files(files, target_hz, output_folder, output_ext,
+                                            workers=workers, quality_flags=QUALITY_FLAGS[output_ext])
+    wall = time.perf_counter() - start
+    converted = [r for r in results if r["status"] == "converted"]
+    stage_totals = {}
+    for result in converted:
+        for stage, value in result["stats"].items():
+            if stage.endswith("_s"):
+                stage_totals[stage] = stage_totals.get(stage, 0) + value
+    return {
+        "files": len(files),
+        "workers": workers,
+        "converted": len(converted),
+        "wall_s": wall,
+        "files_per_minute": len(converted) / wall * 60 if wall else None,
+        "stage_totals": stage_totals,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the file conversion pipeline.")
+    parser.add_argument("--signals", nargs="+", default=["tone", "music"], choices=["tone", "music"])
+    parser.add_argument("--formats", nargs="+", default=[".wav", ".flac", ".mp3"])
+    parser.add_argument("--lengths", type=float, nargs="+", default=[10, 60, 300], help="seconds")
+    parser.add_argument("--target", type=float, default=432.0)
+    parser.add_argument("--output-ext", default=".mp3", choices=sorted(QUALITY_FLAGS))
+    parser.add_argument("--pipelines", nargs="+", default=["wav", "vocoder", "stream"],
+                        choices=["wav", "vocoder", "stream"])
+    parser.add_argument("--vocoder-preset", default=converter.VOCODER_PRESET,
+                        choices=sorted(converter.OFFLINE_PRESETS))
+    parser.add_argument("--workers", type=int, default=converter.DEFAULT_WORKERS)
+    parser.add_argument("--json", default=f"bench_file_converter_{datetime.now():%Y-%m-%d_%H%M%S}.json")
+    parser.add_argument("--scratch-dir", help="scratch folder for temp WAVs (default: inside the work folder), "
+                                              "e.g. /dev/shm to compare with tmpfs")
+    parser.add_argument("--keep", action="store_true", help="keep the work folder")
+    args = parser.parse_args()
+
+    # Tools vooraf controleren i.p.v. halverwege de benchmark te falen
+    if not converter.check_tools([args.output_ext] + args.formats, rubberband="wav" in args.pipelines):
+        raise SystemExit(1)
+
+    json_path = os.path.abspath(args.json)
+    workdir = tempfile.mkdtemp(prefix="bench_converter_")
+
+    # Eigen DB, scratch map en geen cache, anders meten we cache hits
+    converter.DB_PATH = os.path.join(workdir, "bench.db")
+    converter.SCRATCH_DIR = args.scratch_dir or os.path.join(workdir, "scratch")
+    converter.CACHE_ENABLED = False
+    converter.init_database()
+
+    converter.VOCODER_PRESET = args.vocoder_preset
+    report = {"timestamp": datetime.now().isoformat(), "target_hz": args.target,
+              "output_ext": args.output_ext, "scratch_dir": converter.SCRATCH_DIR,
+              "vocoder_preset": args.vocoder_preset, "tools": converter.resolve_tools()["versions"],
+              "single": [], "batch": []}
+    try:
+        inputs = []
+        for kind in args.signals:
+            for seconds in args.lengths:
+                signal = make_signal(kind, seconds)
+                for ext in args.formats:
+                    # Formaat in de naam: zelfde stem voor .wav en .mp3 zou in de batch dezelfde output geven
+                    path = os.path.join(workdir, f"{kind}_{seconds:g}s_{ext.lstrip('.')}{ext}")
+                    write_input(path, signal)
+                    inputs.append({"signal": kind, "seconds": seconds, "format": ext, "path": path})
+
+        for pipeline in args.pipelines:
+            streaming = pipeline == "stream"
+            converter.PITCH_BACKEND = "vocoder" if pipeline == "vocoder" else "rubberband"
+            for item in inputs:
+                output = os.path.join(workdir, f"out_{pipeline}_{os.path.basename(item['path'])}{args.output_ext}")
+                result = run_isolated(bench_single, item["path"], output, args.target, streaming)
+                result["pitch_error_cents"] = (output_pitch_error(output, args.target, item["signal"])
+                                               if result["ok"] else None)
+                result.update(pipeline=pipeline, signal=item["signal"], seconds=item["seconds"],
+                              format=item["format"], input_bytes=os.path.getsize(item["path"]),
+                              realtime_factor=result["wall_s"] / item["seconds"])
+                report["single"].append(result)
+                error = "n/a" if result["pitch_error_cents"] is None else f"{result['pitch_error_cents']:+.2f}"
+                print(f"[{pipeline}] {os.path.basename(item['path']):<22} {result['wall_s']:7.2f} s"
+                      f"  shift {result['stages'].get('shift_s', 0):6.2f} s"
+                      f"  temp {result['stages'].get('temp_bytes', 0) / 1e6:8.1f} MB  pitch {error} cents")
+
+            converter.STREAMING_PIPELINE = streaming
+            batch_dir = os.path.join(workdir, f"batch_{pipeline}")
+            result = run_isolated(bench_batch, [item["path"] for item in inputs], args.target, batch_dir,
+                                  args.output_ext, args.workers)
+            result["pipeline"] = pipeline
+            report["batch"].append(result)
+            print(f"[{pipeline}] batch: {result['converted']}/{result['files']} converted, "
+                  f"{result['files_per_minute']:.1f} files/min with {args.workers} workers")
+    finally:
+        converter.close_database()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#Benchmark - real-time DSP pad (Functie 2) offline, zonder audio devices of GUI
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+from scipy.io import wavfile
+from Realtime_DSP_Core import RealtimeProcessor
+from Functie1_Local_File_Converter import estimate_tuning_reference, tuning_reference_for
+
+ALLOC_CHECK_BLOCKSIZE = 1024  # blokgrootte voor --check-alloc
+
+
+#   --------------------
+#   Test signalen
+#   --------------------
+def make_signal(kind, samplerate, seconds, channels=2, seed=0):
+    """Synthetic stereo test signal at 440 Hz reference: sine, chord or noise."""
+    t = np.arange(int(samplerate * seconds)) / samplerate
+    rng = np.random.default_rng(seed)
+    if kind == "sine":
+        mono = 0.5 * np.sin(2 * np.pi * 440.0 * t)
+    elif kind == "chord":
+        # A-groot drieklank (12-TET t.o.v. 440 Hz) met boventonen
+        mono = np.zeros_like(t)
+        for midi in (57, 61, 64, 69):
+            f = 440.0 * 2 ** ((midi - 69) / 12)
+            for h in range(1, 5):
+                mono += np.sin(2 * np.pi * f * h * t + rng.random() * 6) / (h * 8)
+    elif kind == "noise":
+        mono = 0.2 * rng.standard_normal(len(t))
+    else:
+        raise ValueError(f"Unknown signal: {kind}")
+    # Kleine verschillen tussen L en R zodat het stereobeeld meetelt
+    gains = np.linspace(1.0, 0.8, channels)
+    return (mono[:, None] * gains[None, :]).astype(np.float32)
+
+def load_signal(path, channels=2):
+    """Read a WAV file as float32 (frames, channels); returns (signal, samplerate)."""
+    rate, data = wavfile.read(path)
+    if data.dtype.kind == "i":
+        data = data / float(np.iinfo(data.dtype).max)
+    data = np.asarray(data, dtype=np.float32)
+    if data.ndim == 1:
+        data = data[:, None]
+    if data.shape[1] != channels:
+        data = np.repeat(data.mean(axis=1, keepdims=True), channels, axis=1)
+    return data, rate
+
+#   --------------------
+#   Pitch nauwkeurigheid
+#   --------------------
+def peak_frequency(x, rate):
+    """Frequency of the strongest spectral peak, refined by parabolic interpolation."""
+    n = 1 << int(np.ceil(np.log2(len(x) * 4)))
+    mag = np.log(np.abs(np.fft.rfft(x * np.hanning(len(x)), n)) + 1e-12)
+    k = int(np.argmax(mag[1:-1])) + 1
+    a, b, c = mag[k - 1], mag[k], mag[k + 1]
+    return (k + 0.5 * (a - c) / (a - 2 * b + c)) * rate / n
+
+def pitch_error_cents(kind, output, rate, ratio):
+    """Pitch error of the output in cents, or None when the signal has no pitch (noise)."""
+    if kind == "noise":
+        return None
+    mono = output.mean(axis=1)
+    if kind == "sine":
+        return 1200 * np.log2(peak_frequency(mono, rate) / (440.0 * ratio))
+    detected, confidence = estimate_tuning_reference(mono, rate)
+    if confidence < 0.3:
+        return None
+    return 1200 * np.log2(detected / tuning_reference_for(440.0 * ratio))
+
+#   --------------------
+#   Benchmark run
+#   --------------------
+def run_case(signal, kind, samplerate, blocksize, target_hz, measure_alloc=False):
+    """
+    Drive RealtimeProcessor block by block like PortAudio would: callback,
+    then the worker step. Returns a result dict.
+    """
+    ratio = target_hz / 440.0
+    channels = signal.shape[1]
+    processor = RealtimeProcessor(ratio, blocksize=blocksize, samplerate=samplerate, channels=channels)
+    n_blocks = len(signal) // blocksize
+    output = np.zeros((n_blocks * blocksize, channels), dtype=np.float32)
+    block_ns = np.zeros(n_blocks, dtype=np.int64)
+    warmup = min(n_blocks, 8)
+    alloc_peak = 0
+
+    for i in range(n_blocks):
+        indata = signal[i * blocksize:(i + 1) * blocksize]
+        outdata = output[i * blocksize:(i + 1) * blocksize]
+        tracking = measure_alloc and i >= warmup
+        if tracking:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter_ns()
+        processor.audio_callback(indata, outdata, blocksize, None, None)
+        while processor.process_available():
+            pass
+        block_ns[i] = time.perf_counter_ns() - start
+
+        if tracking:
+            alloc_peak = max(alloc_peak, tracemalloc.get_traced_memory()[1] - base)
+
+    # Vertraging eraf voor de pitch meting
+    shifted = output[processor.latency_frames:]
+    block_ms = block_ns / 1e6
+    budget_ms = blocksize / samplerate * 1000
+    error = pitch_error_cents(kind, shifted, samplerate, ratio) if len(shifted) > samplerate // 2 else None
+    return {
+        "signal": kind,
+        "samplerate": samplerate,
+        "blocksize": blocksize,
+        "target_hz": target_hz,
+        "blocks": n_blocks,
+        "rtf": float(block_ns.sum() / 1e9 / (len(output) / samplerate)),
+        "p50_ms": float(np.percentile(block_ms, 50)),
+        "p99_ms": float(np.percentile(block_ms, 99)),
+        "max_ms": float(block_ms.max()),
+        "budget_ms": budget_ms,
+        "deadline_misses": int((block_ms > budget_ms).sum()),
+        "underruns": processor.underruns,
+        "pitch_error_cents": None if error is None else float(error),
+        "alloc_peak_bytes": int(alloc_peak) if measure_alloc else None,
+    }
+
+def check_allocations(rates, targets, seconds, blocksize=ALLOC_CHECK_BLOCKSIZE):
+    """
+    Check that the real-time path allocates no NumPy buffers after warm-up.
+
+    The traced heap peak per block must stay below one mono float32 block
+    (blocksize x 4 bytes): every array the callback or the worker step could
+    create per block is at least that large, while the remaining Python
+    object overhead (views, ints, frames) is fixed, about 2 KB whatever the
+    block size. Needs tracemalloc running. Returns the failing result dicts.
+    """
+    limit = blocksize * np.dtype(np.float32).itemsize
+    failures = []
+    for rate in rates:
+        for kind in ("sine", "chord"):
+            signal = make_signal(kind, rate, seconds)
+            for target_hz in targets:
+                result = run_case(signal, kind, rate, blocksize, target_hz, measure_alloc=True)
+                ok = result["alloc_peak_bytes"] < limit
+                print(f"{'OK  ' if ok else 'FAIL'} {kind:<6} {rate:>6} Hz -> {target_hz:.1f} Hz: "
+                      f"{result['alloc_peak_bytes']} bytes traced per block (limit {limit})")
+                if not ok:
+                    failures.append(result)
+    return failures
+
+def print_row(r):
+    error = "   n/a" if r["pitch_error_cents"] is None else f"{r['pitch_error_cents']:+6.2f}"
+    alloc = "" if r["alloc_peak_bytes"] is None else f" {r['alloc_peak_bytes']:>7d}"
+    print(f"{r['signal']:<12} {r['samplerate']:>6} {r['blocksize']:>5} {r['target_hz']:>7.1f} "
+          f"{r['rtf']:>7.4f} {r['p50_ms']:>7.3f} {r['p99_ms']:>7.3f} {r['max_ms']:>7.3f} "
+          f"{r['budget_ms']:>7.2f} {r['deadline_misses']:>6d} {error}{alloc}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the real-time pitch shift DSP path.")
+    parser.add_argument("--blocksizes", type=int, nargs="+", default=[128, 256, 512, 1024])
+    parser.add_argument("--rates", type=int, nargs="+", default=[44100, 48000])
+    parser.add_argument("--targets", type=float, nargs="+", default=[432.0, 528.0])
+    parser.add_argument("--signals", nargs="+", default=["sine", "chord", "noise"],
+                        choices=["sine", "chord", "noise"])
+    parser.add_argument("--files", nargs="*", default=[], help="WAV files to run at their own sample rate")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--alloc", action="store_true", help="also measure traced heap peak per block")
+    parser.add_argument("--check-alloc", action="store_true",
+                        help="only check that no NumPy buffers are allocated per block after warm-up; "
+                             "exits with 1 on failure")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.check_alloc:
+        tracemalloc.start()
+        failures = check_allocations(args.rates, args.targets, args.seconds)
+        tracemalloc.stop()
+        raise SystemExit(1 if failures else 0)
+
+    cases = []
+    for rate in args.rates:
+        for kind in args.signals:
+            cases.append((kind, rate, make_signal(kind, rate, args.seconds)))
+    for path in args.files:
+        signal, rate = load_signal(path)
+        cases.append(("file", rate, signal))
+
+    if args.alloc:
+        tracemalloc.start()
+
+    print(f"{'signal':<12} {'rate':>6} {'block':>5} {'target':>7} {'RTF':>7} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'max ms':>7} {'budget':>7} {'misses':>6} {'cents':>6}" + (" {:>7}".format("alloc") if args.alloc else ""))
+    results = []
+    for kind, rate, signal in cases:
+        for blocksize in args.blocksizes:
+            for target_hz in args.targets:
+                result = run_case(signal, kind, rate, blocksize, target_hz, args.alloc)
+                results.append(result)
+                print_row(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(), "results": results}, f, indent=2)
+        print(f"Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,197 @@
 #Functie 1 - Local File Converter
 import subprocess
 import os
+import sys
+import glob
+import argparse
 import math
+import cmath
 import numpy as np
 from scipy.io import wavfile
 import sqlite3
-from datetime import datetime
+import hashlib
+import tempfile
+import shutil
+import time
+import json
+import threading
+import atexit
+import signal
+import select
+import struct
+import queue
+import wave
+import multiprocessing
+from contextlib import contextmanager
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from Pitch_Shift_Engine import StreamingPitchShifter, OfflinePitchShifter, OFFLINE_PRESETS, semitones_to_ratio
 # from pydub import AudioSegment
 
-#Paths
-FFMPEG_PATH = r"C:\Gegevens Nino\ffmpeg\bin\ffmpeg.exe"
-RUBBERBAND_PATH = r"C:\Gegevens Nino\rubberband\rubberband.exe"
+#Paths (None = automatisch zoeken bij het eerste gebruik: env var met dezelfde naam, PATH, dan TOOL_SEARCH_DIRS;
+#zie resolve_tools / tool_path)
+FFMPEG_PATH = None
+FFPROBE_PATH = None
+RUBBERBAND_PATH = None
+TOOL_SEARCH_DIRS = [r"C:\Gegevens Nino\ffmpeg\bin", r"C:\Gegevens Nino\rubberband"]
 DB_PATH = "audio_converter.db"
+DB_BATCH_SIZE = 50  # history rijen per transactie tijdens een batch
+HISTORY_PAGE_SIZE = 20
+
+# Kolommen van converted_files die per conversie worden geschreven (zie conversion_row)
+STAGE_COLUMNS = ("hash_s", "ingest_s", "analyse_s", "decode_s", "shift_s", "encode_s", "stream_s", "total_s")
+CONVERSION_COLUMNS = ("input_path", "output_path", "detected_hz", "target_hz", "timestamp", "output_bytes",
+                      "stage_timings", "output_ext", "status", "error", "duration_s", "input_bytes",
+                      "codec", "input_mtime", "shift_cents") + STAGE_COLUMNS
+OUTPUT_CODECS = {".mp3": "mp3", ".flac": "flac", ".wav": "pcm_s16le"}  # ffmpeg standaard encoder per formaat
+# Encoders per formaat in volgorde van voorkeur; de eerste die ffmpeg heeft wordt gebruikt
+ENCODER_PREFERENCES = {".mp3": ("libmp3lame", "libshine", "mp3_mf"), ".flac": ("flac",), ".wav": ("pcm_s16le",)}
+
+#Batch instellingen
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+#Pipeline instellingen
+STREAMING_PIPELINE = False  # True = ffmpeg -> in-process pitch shift -> ffmpeg, zonder temp WAV's
+SAMPLE_RATE = 44100
+CHANNELS = 2
+STREAM_BLOCK_FRAMES = 65536  # ook de blokgrootte van iter_wav_blocks / iter_pcm_blocks
+PITCH_BACKEND = "rubberband"  # WAV pipeline: "rubberband" (CLI) of "vocoder" (ingebouwd, Pitch_Shift_Engine)
+VOCODER_PRESET = "balanced"  # fast / balanced / high, zie OFFLINE_PRESETS
+NEAR_TARGET_CENTS = 4.0  # kleinere shift (gemeten -> target) = bestand zit al op de target (~1 Hz bij 432 Hz)
+
+#Cache instellingen
+CACHE_ENABLED = True
+CACHE_DIR = "conversion_cache"
+CACHE_MAX_BYTES = 10 * 1024 ** 3  # 10 GB aan gecachte outputs
+
+#Analyse instellingen
+SAMPLING_MODE = "multi"  # "start" = eerste 3 s, "multi" = meerdere vensters verspreid over het bestand,
+                         # "full" = hele bestand in blokken (constant geheugen, trager)
+SAMPLE_SEGMENTS = 6
+SAMPLE_SEGMENT_SECONDS = 2.0
+SAMPLE_MIN_CONFIDENCE = 0.9  # vroeg stoppen zodra de schatting zo zeker is
+
+#Watch folder instellingen
+WATCH_DEBOUNCE_SECONDS = 2.0  # zo lang geen wijzigingen voordat een bestand als compleet geldt
+WATCH_POLL_SECONDS = 2.0  # scan interval van de polling fallback
+
+#Scratch instellingen (tijdelijke WAV's)
+SCRATCH_DIR = None  # None = systeem temp map; bv. "/dev/shm" (tmpfs/RAM-disk) of een snelle lokale schijf
+SCRATCH_PREFIX = "tuning_scratch_"
+SCRATCH_RESERVE_BYTES = 256 * 1024 ** 2  # altijd zoveel vrij laten op de scratch schijf
 
 
 #Functies
+def temp_name(input_file, suffix="", folder=None):
+    """Build a temp WAV path in `folder` (default the scratch root), unique per input path."""
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    digest = hashlib.sha1(os.path.abspath(input_file).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(folder or scratch_root(), f"temp_{base_name}_{digest}{suffix}.wav")
+
+#   --------------------
+#   Scratch ruimte
+#   --------------------
+_scratch_root = None
+_scratch_reserved = {}  # scratch map -> gereserveerde bytes
+_scratch_lock = threading.Lock()
+
+def pid_alive(pid):
+    """True when a process with this pid is still running."""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION; os.kill zou het proces op Windows beëindigen
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def cleanup_stale_scratch(base):
+    """Remove scratch roots left behind by processes that no longer run. Returns the number removed."""
+    removed = 0
+    try:
+        entries = list(os.scandir(base))
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.name.startswith(SCRATCH_PREFIX) or not entry.is_dir(follow_symlinks=False):
+            continue
+        pid = entry.name[len(SCRATCH_PREFIX):].split("_")[0]
+        if pid.isdigit() and not pid_alive(int(pid)):
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+def scratch_root():
+    """
+    This process' scratch directory under SCRATCH_DIR, created on first use.
+
+    Stale roots of crashed runs are removed at that moment, and the root
+    itself is removed when the interpreter exits.
+    """
+    global _scratch_root
+    with _scratch_lock:
+        if _scratch_root is None or not os.path.isdir(_scratch_root):
+            base = SCRATCH_DIR or tempfile.gettempdir()
+            os.makedirs(base, exist_ok=True)
+            removed = cleanup_stale_scratch(base)
+            if removed:
+                print(f"Removed {removed} stale scratch folder(s) from earlier runs.")
+            _scratch_root = tempfile.mkdtemp(prefix=f"{SCRATCH_PREFIX}{os.getpid()}_", dir=base)
+            atexit.register(shutil.rmtree, _scratch_root, True)
+        return _scratch_root
+
+def estimate_decoded_bytes(input_file, copies=1):
+    """Rough size of `copies` decoded 16-bit WAVs of the input, for the scratch budget."""
+    if input_file.lower().endswith(".wav"):
+        duration = os.path.getsize(input_file) / (SAMPLE_RATE * CHANNELS * 2)
+    else:
+        duration = probe_duration(input_file)
+        if duration is None:
+            # Ruime schatting: lossy input van ~128 kbps
+            duration = os.path.getsize(input_file) / 16000
+    return int(duration * SAMPLE_RATE * CHANNELS * 2 * copies)
+
+def new_scratch_dir(label="job", need_bytes=0):
+    """
+    Create a unique scratch directory for one job and reserve `need_bytes` in it.
+
+    Raises OSError when the scratch disk cannot hold the reservation next to
+    what running jobs already reserved. Release it with release_scratch_dir.
+    """
+    root = scratch_root()
+    with _scratch_lock:
+        if need_bytes:
+            free = shutil.disk_usage(root).free - sum(_scratch_reserved.values()) - SCRATCH_RESERVE_BYTES
+            if need_bytes > free:
+                raise OSError(f"Not enough scratch space in {root}: need {need_bytes / 1e6:.0f} MB, "
+                              f"{max(free, 0) / 1e6:.0f} MB available")
+        path = tempfile.mkdtemp(prefix=f"{label}_", dir=root)
+        _scratch_reserved[path] = need_bytes
+    return path
+
+def release_scratch_dir(path):
+    """Remove a scratch directory and drop its reservation."""
+    if not path:
+        return
+    with _scratch_lock:
+        _scratch_reserved.pop(path, None)
+    shutil.rmtree(path, ignore_errors=True)
+
+def exit_on_sigterm():
+    """Turn SIGTERM into SystemExit so finally blocks and atexit cleanup still run."""
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
 def run_subprocess(cmd, description="Processing"):
     """Run a subprocess and handle errors gracefully."""
     try:
@@ -31,11 +208,187 @@ def run_subprocess(cmd, description="Processing"):
         print(e.stderr.decode('utf-8'))
         return False
 
-def init_database():
-    """Create database & tables if not exist."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+#   --------------------
+#   Externe tools (ffmpeg / ffprobe / rubberband)
+#   --------------------
+TOOLS = {}  # resultaat van resolve_tools, 1x per proces
+TOOLS_LOCK = threading.Lock()
 
+def find_tool(name, configured=None, near=None):
+    """
+    Path of an external program, or None: the configured path (or name),
+    else env var <NAME>_PATH, the folder of `near`, PATH and TOOL_SEARCH_DIRS.
+    """
+    candidate = configured or os.environ.get(f"{name.upper()}_PATH")
+    if candidate:
+        # Een expliciete instelling wint; niet stilletjes een andere versie pakken
+        return shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+    if near:
+        found = shutil.which(name, path=os.path.dirname(near))
+        if found:
+            return found
+    return shutil.which(name) or shutil.which(name, path=os.pathsep.join(TOOL_SEARCH_DIRS))
+
+def tool_output(cmd):
+    """Combined stdout/stderr of a short probe command, or None if it cannot run."""
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode("utf-8", errors="replace")
+
+def resolve_tools(refresh=False):
+    """
+    Find ffmpeg, ffprobe and rubberband, probe their versions and the
+    ffmpeg audio encoders once, and fill in FFMPEG_PATH / FFPROBE_PATH /
+    RUBBERBAND_PATH. Returns the cached TOOLS dict (paths, versions,
+    encoders); missing tools have path None.
+    """
+    global FFMPEG_PATH, FFPROBE_PATH, RUBBERBAND_PATH
+    with TOOLS_LOCK:
+        if TOOLS and not refresh:
+            return TOOLS
+        ffmpeg = find_tool("ffmpeg", FFMPEG_PATH)
+        ffprobe = find_tool("ffprobe", FFPROBE_PATH, near=ffmpeg)
+        rubberband = find_tool("rubberband", RUBBERBAND_PATH)
+
+        versions = {}
+        for name, path, flag in (("ffmpeg", ffmpeg, "-version"), ("ffprobe", ffprobe, "-version"),
+                                 ("rubberband", rubberband, "--version")):
+            output = tool_output([path, flag]) if path else None
+            versions[name] = output.strip().splitlines()[0] if output and output.strip() else None
+
+        # Audio encoders: regels als " A....D libmp3lame  libmp3lame MP3 (MPEG audio layer 3)"
+        encoders = set()
+        listing = tool_output([ffmpeg, "-hide_banner", "-encoders"]) if ffmpeg else None
+        for line in (listing or "").splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and len(parts[0]) == 6 and parts[0].startswith("A"):
+                encoders.add(parts[1])
+
+        TOOLS.clear()
+        TOOLS.update(ffmpeg=ffmpeg, ffprobe=ffprobe, rubberband=rubberband, versions=versions,
+                     encoders=encoders if listing else None)
+        FFMPEG_PATH = ffmpeg or FFMPEG_PATH
+        FFPROBE_PATH = ffprobe or FFPROBE_PATH
+        RUBBERBAND_PATH = rubberband or RUBBERBAND_PATH
+        return TOOLS
+
+def tool_path(name):
+    """
+    Path of "ffmpeg", "ffprobe" or "rubberband" for a subprocess call,
+    resolved on first use. Raises FileNotFoundError when it is not found.
+    """
+    path = resolve_tools()[name]
+    if not path:
+        raise FileNotFoundError(f"{name} not found (set {name.upper()}_PATH, or add it to PATH)")
+    return path
+
+def output_encoder(output_ext):
+    """Fastest available ffmpeg encoder for an output format (ENCODER_PREFERENCES), or None."""
+    preferences = ENCODER_PREFERENCES.get(output_ext.lower())
+    if not preferences:
+        return None
+    encoders = resolve_tools()["encoders"]
+    if encoders is None:
+        return preferences[0]  # lijst niet op te vragen: ffmpeg zijn standaard laten kiezen
+    return next((name for name in preferences if name in encoders), None)
+
+def needs_rubberband():
+    """True when conversions go through the Rubberband CLI (WAV pipeline with the rubberband backend)."""
+    return not STREAMING_PIPELINE and PITCH_BACKEND == "rubberband"
+
+def check_tools(output_exts=(), rubberband=None):
+    """
+    Fail fast before a batch: check that ffmpeg, ffprobe, an encoder for
+    every output format and (if needed, see needs_rubberband) rubberband
+    are available. Prints what is missing; returns True when all is there.
+    """
+    tools = resolve_tools()
+    if rubberband is None:
+        rubberband = needs_rubberband()
+    problems = []
+    for name in ("ffmpeg", "ffprobe") + (("rubberband",) if rubberband else ()):
+        if not tools[name]:
+            problems.append(f"{name} not found (set {name.upper()}_PATH, or add it to PATH)")
+        elif not tools["versions"][name]:
+            problems.append(f"{name} at {tools[name]} does not run")
+    if tools["versions"]["ffmpeg"]:
+        for ext in output_exts:
+            if ext.lower() in ENCODER_PREFERENCES and not output_encoder(ext):
+                problems.append(f"ffmpeg has no encoder for {ext} (tried {', '.join(ENCODER_PREFERENCES[ext])})")
+    for problem in problems:
+        print(f"❌ Error: {problem}")
+    if rubberband and not tools["rubberband"]:
+        print("   Or use the built-in pitch shifter: --pitch-backend vocoder or --streaming.")
+    return not problems
+
+def print_tools():
+    """Print resolve_tools(): paths, versions and the encoder chosen per output format."""
+    tools = resolve_tools()
+    for name in ("ffmpeg", "ffprobe", "rubberband"):
+        print(f"{name:<11} {tools[name] or 'not found'}")
+        if tools["versions"][name]:
+            print(f"{'':<11} {tools['versions'][name]}")
+    for ext in ENCODER_PREFERENCES:
+        print(f"{ext:<11} encoder {output_encoder(ext) or 'none available'}")
+
+#   --------------------
+#   Database
+#   --------------------
+_db_conn = None
+_db_conn_path = None
+DB_LOCK = threading.RLock()
+
+def get_connection():
+    """Long-lived shared connection in WAL mode. Only use it while holding DB_LOCK."""
+    global _db_conn, _db_conn_path
+    if _db_conn is None or _db_conn_path != DB_PATH:
+        if _db_conn is not None:
+            _db_conn.close()
+        _db_conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+        # WAL: lezers blokkeren schrijvers niet; NORMAL: geen fsync per commit
+        _db_conn.execute("PRAGMA journal_mode=WAL")
+        _db_conn.execute("PRAGMA synchronous=NORMAL")
+        _db_conn_path = DB_PATH
+    return _db_conn
+
+def close_database():
+    """Close the shared connection (a new one is opened on next use)."""
+    global _db_conn, _db_conn_path
+    with DB_LOCK:
+        if _db_conn is not None:
+            _db_conn.close()
+        _db_conn = _db_conn_path = None
+
+@contextmanager
+def db_cursor():
+    """Cursor on the shared connection inside one transaction, committed on success."""
+    with DB_LOCK:
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            yield cur
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+#   Schema migraties: PRAGMA user_version = laatst toegepaste versie
+def add_column(cur, table, column, declaration):
+    """ALTER TABLE ADD COLUMN, skipped when the column already exists."""
+    existing = {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        return True
+    return False
+
+def migrate_v1(cur):
+    """Original tables."""
     cur.execute("""
     CREATE TABLE IF NOT EXISTS converted_files (
         id INTEGER PRIMARY KEY AUTOINCREMENT, 
@@ -46,83 +399,617 @@ def init_database():
         timestamp TEXT 
     )
     """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS conversion_cache (
+        cache_key TEXT PRIMARY KEY,
+        input_digest TEXT,
+        target_hz REAL,
+        output_ext TEXT,
+        quality TEXT,
+        cached_path TEXT,
+        size_bytes INTEGER,
+        detected_hz REAL,
+        last_used TEXT
+    )
+    """)
+
+def migrate_v2(cur):
+    """Output size, stage timings (JSON), stored output extension and history indexes."""
+    add_column(cur, "converted_files", "output_bytes", "INTEGER")
+    add_column(cur, "converted_files", "stage_timings", "TEXT")
+    if add_column(cur, "converted_files", "output_ext", "TEXT"):
+        # Oude rijen: extensie eenmalig uit output_path halen
+        cur.execute("SELECT id, output_path FROM converted_files")
+        cur.executemany("UPDATE converted_files SET output_ext = ? WHERE id = ?",
+                        [(output_ext_of(path), row_id) for row_id, path in cur.fetchall()])
+
+    # Indexen voor de history filters (zie query_conversions)
+    for name, columns in (("idx_converted_timestamp", "timestamp, id"),
+                          ("idx_converted_target", "target_hz, timestamp, id"),
+                          ("idx_converted_ext", "output_ext, timestamp, id"),
+                          ("idx_converted_detected", "detected_hz"),
+                          ("idx_converted_input", "input_path")):
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON converted_files ({columns})")
+
+def migrate_v3(cur):
+    """Status, audio duration, input size, output codec and one column per stage timing."""
+    for column, declaration in (("status", "TEXT"), ("error", "TEXT"), ("duration_s", "REAL"),
+                                ("input_bytes", "INTEGER"), ("codec", "TEXT")):
+        add_column(cur, "converted_files", column, declaration)
+    for column in STAGE_COLUMNS:
+        add_column(cur, "converted_files", column, "REAL")
+
+    # Oude rijen zijn altijd geslaagde conversies; timings uit de JSON kolom overnemen
+    cur.execute("UPDATE converted_files SET status = 'converted' WHERE status IS NULL")
+    cur.execute("SELECT id, output_ext, stage_timings FROM converted_files WHERE stage_timings IS NOT NULL")
+    updates = []
+    for row_id, ext, timings in cur.fetchall():
+        timings = json.loads(timings)
+        updates.append(tuple(timings.get(c) for c in STAGE_COLUMNS) + (OUTPUT_CODECS.get(ext), row_id))
+    assignments = ", ".join(f"{c} = ?" for c in STAGE_COLUMNS)
+    cur.executemany(f"UPDATE converted_files SET {assignments}, codec = ? WHERE id = ?", updates)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_converted_status ON converted_files (status, output_ext)")
+
+def migrate_v4(cur):
+    """Resumable batch jobs: one row per run plus the state of every file in it."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS batch_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created TEXT,
+        updated TEXT,
+        status TEXT,
+        target_hz REAL,
+        output_folder TEXT,
+        output_ext TEXT,
+        quality TEXT,
+        near_target TEXT,
+        overwrite INTEGER
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS batch_job_files (
+        job_id INTEGER,
+        idx INTEGER,
+        input_path TEXT,
+        state TEXT,
+        status TEXT,
+        output_path TEXT,
+        error TEXT,
+        updated TEXT,
+        PRIMARY KEY (job_id, idx)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_job_files_state ON batch_job_files (job_id, state)")
 
-    conn.commit()
-    conn.close()
+def migrate_v5(cur):
+    """Input mtime for cheap rescans, and the scan settings of recursive batch jobs."""
+    add_column(cur, "converted_files", "input_mtime", "REAL")
+    add_column(cur, "batch_jobs", "source_root", "TEXT")
+    add_column(cur, "batch_jobs", "input_formats", "TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_job_files_path ON batch_job_files (job_id, input_path)")
+
+def migrate_v6(cur):
+    """Shift still needed from the detected to the target tuning, to log the near-target decision."""
+    add_column(cur, "converted_files", "shift_cents", "REAL")
+
+MIGRATIONS = [(1, migrate_v1), (2, migrate_v2), (3, migrate_v3), (4, migrate_v4), (5, migrate_v5),
+              (6, migrate_v6)]
+
+def init_database():
+    """Create the database or bring it up to the latest schema version."""
+    with db_cursor() as cur:
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+    for target, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        # Elke migratie in een eigen transactie, samen met het nieuwe versienummer. Expliciete BEGIN:
+        # sqlite3 opent zelf alleen een transactie voor DML, DDL zou anders meteen committen
+        with db_cursor() as cur:
+            cur.execute("BEGIN IMMEDIATE")
+            if cur.execute("PRAGMA user_version").fetchone()[0] >= target:
+                continue  # intussen door een ander proces gedaan
+            migrate(cur)
+            cur.execute(f"PRAGMA user_version = {target}")
 
 #   Saving to DB
-def save_conversion_to_db(input_path, output_path, detected_hz, target_hz):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+def output_ext_of(path):
+    """Lower-case extension of an output path, as stored in converted_files.output_ext."""
+    return os.path.splitext(path or "")[1].lower()
 
-    cur.execute("""
-    INSERT INTO converted_files (input_path, output_path, detected_hz, target_hz, timestamp) 
-    VALUES (?, ?, ?, ?, ?)
-    """, (input_path, output_path, detected_hz, target_hz, datetime.now().isoformat()))
+def conversion_row(input_path, output_path, detected_hz, target_hz, stats=None, status="converted", error=None,
+                   codec=None):
+    """
+    Build one converted_files row (CONVERSION_COLUMNS order); file sizes are
+    read from disk. codec defaults to the encoder output_encoder picks.
+    """
+    stats = stats or {}
+    output_bytes = os.path.getsize(output_path) if output_path and os.path.exists(output_path) else None
+    try:
+        input_stat = os.stat(input_path)
+        input_bytes, input_mtime = input_stat.st_size, input_stat.st_mtime
+    except (OSError, TypeError):
+        input_bytes = input_mtime = None
+    frames = stats.get("audio_frames")
+    timings = {k: round(v, 4) for k, v in stats.items() if k.endswith("_s")}
+    output_ext = output_ext_of(output_path)
+    return (input_path, output_path, detected_hz, target_hz, datetime.now().isoformat(),
+            output_bytes, json.dumps(timings) if timings else None, output_ext,
+            status, error, frames / SAMPLE_RATE if frames else None, input_bytes,
+            codec or output_encoder(output_ext) or OUTPUT_CODECS.get(output_ext), input_mtime,
+            stats.get("shift_cents")) + tuple(timings.get(c) for c in STAGE_COLUMNS)
+
+def insert_conversions(cur, rows):
+    cur.executemany(f"""
+    INSERT INTO converted_files ({", ".join(CONVERSION_COLUMNS)})
+    VALUES ({", ".join("?" * len(CONVERSION_COLUMNS))})
+    """, rows)
+
+def save_conversions_to_db(rows):
+    """Insert many conversion_row() rows in one transaction."""
+    if not rows:
+        return
+    with db_cursor() as cur:
+        insert_conversions(cur, rows)
+
+def result_row(result, target_hz=None):
+    """
+    converted_files row for a process_batch_file result, or None for
+    statuses that are not recorded. Fan-out results carry their own target_hz.
+    """
+    # Mislukte bestanden ook vastleggen, voor de failure rate in de statistieken;
+    # copied/skipped leggen de near-target beslissing vast
+    if result["status"] not in ("converted", "cached", "copied", "skipped", "invalid", "failed"):
+        return None
+    return conversion_row(
+        input_path=result["input_path"],
+        output_path=result["output_path"],
+        detected_hz=result["detected_hz"],
+        target_hz=result.get("target_hz", target_hz),
+        stats=result["stats"],
+        status=result["status"],
+        error=result["error"],
+        codec=result.get("codec"),
+    )
 
-    conn.commit()
-    conn.close()
+def save_conversion_to_db(input_path, output_path, detected_hz, target_hz, stats=None, status="converted",
+                          error=None):
+    save_conversions_to_db([conversion_row(input_path, output_path, detected_hz, target_hz, stats, status, error)])
+
+#   History opvragen
+HISTORY_COLUMNS = "id, input_path, output_path, detected_hz, target_hz, timestamp, output_bytes, stage_timings, status"
+
+def history_filter_sql(target_hz=None, output_ext=None, since=None, until=None,
+                       input_prefix=None, min_detected_hz=None, max_detected_hz=None):
+    """Build the WHERE clause and parameters for the history filters. All filters are index friendly."""
+    where, params = [], []
+    if target_hz is not None:
+        # Gelijkheid (targets worden exact opgeslagen): de index levert dan ook de volgorde
+        where.append("target_hz = ?")
+        params.append(float(target_hz))
+    if output_ext:
+        ext = output_ext.lower()
+        where.append("output_ext = ?")
+        params.append(ext if ext.startswith(".") else "." + ext)
+    if since:
+        where.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        where.append("timestamp < ?")
+        params.append(until)
+    if input_prefix:
+        # Prefix als range: LIKE gebruikt de index niet (hoofdletter ongevoelig)
+        where.append("input_path >= ? AND input_path < ?")
+        params += [input_prefix, input_prefix + "\U0010ffff"]
+    if min_detected_hz is not None:
+        where.append("detected_hz >= ?")
+        params.append(min_detected_hz)
+    if max_detected_hz is not None:
+        where.append("detected_hz <= ?")
+        params.append(max_detected_hz)
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+def query_conversions(page_size=HISTORY_PAGE_SIZE, **filters):
+    """
+    Yield pages (lists of rows, newest first) of converted_files matching the filters.
+
+    Uses keyset pagination on (timestamp, id), so every page is one index
+    range scan no matter how deep into the history it is.
+    """
+    where, params = history_filter_sql(**filters)
+    after = None
+    while True:
+        sql, page_params = f"SELECT {HISTORY_COLUMNS} FROM converted_files{where}", list(params)
+        if after is not None:
+            sql += (" AND " if where else " WHERE ") + "(timestamp, id) < (?, ?)"
+            page_params += list(after)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        page_params.append(page_size)
+        with db_cursor() as cur:
+            rows = cur.execute(sql, page_params).fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        after = (rows[-1][5], rows[-1][0])
+
+def count_conversions(**filters):
+    """Number of converted_files rows matching the filters."""
+    where, params = history_filter_sql(**filters)
+    with db_cursor() as cur:
+        return cur.execute(f"SELECT COUNT(*) FROM converted_files{where}", params).fetchone()[0]
 
 #   Show all converted
 def list_all_converted():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM converted_files ORDER BY timestamp DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    with db_cursor() as cur:
+        cur.execute(f"SELECT {HISTORY_COLUMNS} FROM converted_files ORDER BY timestamp DESC")
+        return cur.fetchall()
+
+#   --------------------
+#   Conversion cache
+#   --------------------
+
+#   Content hash van de input
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of the file contents, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_key(input_digest, target_hz, output_ext, quality_flags):
+    """Combine input digest and all output settings into one cache key."""
+    if STREAMING_PIPELINE:
+        pipeline = "stream"
+    elif PITCH_BACKEND == "vocoder":
+        pipeline = f"vocoder-{VOCODER_PRESET}"
+    else:
+        pipeline = "rubberband"
+    parts = [input_digest, f"{float(target_hz):.6f}", output_ext.lower(), " ".join(quality_flags), pipeline]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst, or copy when linking is not possible (other drive)."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+#   Atomisch schrijven: eerst een tijdelijk bestand naast de output, dan hernoemen
+PARTIAL_PREFIX = ".partial_"
+
+def partial_output_path(output_file):
+    """
+    New unique temp file next to the final output, one per writer; keeps
+    the extension so ffmpeg picks the right muxer.
+    """
+    folder, name = os.path.split(output_file)
+    stem, ext = os.path.splitext(name)
+    fd, partial = tempfile.mkstemp(prefix=f"{PARTIAL_PREFIX}{stem}.", suffix=ext, dir=folder or os.curdir)
+    os.close(fd)
+    return partial
+
+def stale_partials(output_file):
+    """Partial files an interrupted run left behind for output_file."""
+    folder, name = os.path.split(output_file)
+    stem, ext = os.path.splitext(name)
+    pattern = glob.escape(f"{PARTIAL_PREFIX}{stem}.") + "*" + glob.escape(ext)
+    return glob.glob(os.path.join(glob.escape(folder or os.curdir), pattern))
+
+def publish_output(partial, output_file):
+    """Move a finished partial output into place (atomic on the same filesystem)."""
+    os.replace(partial, output_file)
+
+#   Output namen: inputs met dezelfde naam (song.wav + song.flac) krijgen elk een eigen output
+_output_lock = threading.Lock()
+_output_reserved = {}  # output pad -> input pad
+
+def reserve_output_path(input_path, output_folder, target_hz, output_ext):
+    """
+    Output path for input_path, reserved for it until release_output_paths.
+
+    The name is {stem}_{hz}Hz{ext}; when another input already holds it the
+    source extension is added ({stem}_{src}_{hz}Hz{ext}), then a number.
+    Reserving again for the same input returns the same path, so names only
+    depend on the order in which inputs are reserved.
+    """
+    name, src_ext = os.path.splitext(os.path.basename(input_path))
+    owner = os.path.abspath(input_path)
+    with _output_lock:
+        variant = 0
+        while True:
+            if variant == 0:
+                candidate = f"{name}_{target_hz}Hz{output_ext}"
+            elif variant == 1:
+                candidate = f"{name}_{src_ext.lstrip('.')}_{target_hz}Hz{output_ext}"
+            else:
+                candidate = f"{name}_{src_ext.lstrip('.')}_{variant}_{target_hz}Hz{output_ext}"
+            output_file = os.path.join(output_folder, candidate)
+            holder = _output_reserved.setdefault(os.path.abspath(output_file), owner)
+            if holder == owner:
+                return output_file
+            variant += 1
+
+def keep_output_paths(pairs):
+    """Reserve the (input_path, output_file) pairs an earlier run already wrote; returns the output paths."""
+    with _output_lock:
+        for input_path, output_file in pairs:
+            _output_reserved[os.path.abspath(output_file)] = os.path.abspath(input_path)
+    return [output_file for _, output_file in pairs]
+
+def release_output_paths(output_files):
+    """Drop the reservations of reserve_output_path."""
+    with _output_lock:
+        for output_file in output_files:
+            _output_reserved.pop(os.path.abspath(output_file), None)
+
+#   Cache hit opzoeken
+def cache_lookup(key):
+    """Return (cached_path, detected_hz) for a cache hit, else None."""
+    with db_cursor() as cur:
+        cur.execute("SELECT cached_path, detected_hz FROM conversion_cache WHERE cache_key = ?", (key,))
+        row = cur.fetchone()
+        if row and not os.path.exists(row[0]):
+            # Output is buiten de cache om verwijderd
+            cur.execute("DELETE FROM conversion_cache WHERE cache_key = ?", (key,))
+            row = None
+        elif row:
+            cur.execute("UPDATE conversion_cache SET last_used = ? WHERE cache_key = ?",
+                        (datetime.now().isoformat(), key))
+    return row
+
+#   Output in de cache zetten
+def cache_store(key, input_digest, target_hz, output_ext, quality_flags, output_file, detected_hz):
+    """Keep a link/copy of a finished output in CACHE_DIR and register it."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cached_path = os.path.join(CACHE_DIR, key + output_ext)
+    try:
+        link_or_copy(output_file, cached_path)
+    except OSError as e:
+        # Cache is best effort: de conversie zelf is wel gelukt
+        print(f"⚠️ Could not cache output: {e}")
+        return
+
+    with db_cursor() as cur:
+        cur.execute("""
+        INSERT OR REPLACE INTO conversion_cache
+            (cache_key, input_digest, target_hz, output_ext, quality, cached_path, size_bytes, detected_hz, last_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (key, input_digest, target_hz, output_ext, " ".join(quality_flags), cached_path,
+              os.path.getsize(cached_path), detected_hz, datetime.now().isoformat()))
+
+#   Cache opruimen
+def cache_evict(max_bytes=None):
+    """Remove least recently used cache entries until the cache fits in max_bytes."""
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    with db_cursor() as cur:
+        cur.execute("SELECT cache_key, cached_path, size_bytes FROM conversion_cache ORDER BY last_used DESC")
+        total = 0
+        evicted = 0
+        for key, cached_path, size in cur.fetchall():
+            total += size or 0
+            if total <= max_bytes:
+                continue
+            try:
+                if os.path.exists(cached_path):
+                    os.remove(cached_path)
+            except OSError:
+                continue
+            cur.execute("DELETE FROM conversion_cache WHERE cache_key = ?", (key,))
+            evicted += 1
+    return evicted
 
 #   History DB
+def parse_date_range(text):
+    """'YYYY-MM-DD' or 'YYYY-MM-DD YYYY-MM-DD' -> (since, until) ISO strings, until exclusive."""
+    parts = text.split()
+    if len(parts) not in (1, 2):
+        raise ValueError(text)
+    first = datetime.strptime(parts[0], "%Y-%m-%d")
+    last = datetime.strptime(parts[-1], "%Y-%m-%d")
+    return first.isoformat(), (last + timedelta(days=1)).isoformat()
+
 def show_history_menu():
-    """Show all converted files stored in the database, with optional filter."""
+    """Show converted files stored in the database, filtered in SQL and shown page by page."""
     while True:
         print("\n--- Conversion History Filter ---")
         print("1 = Show all")
         print("2 = Filter by target Hz")
         print("3 = Filter by file type")
-        print("4 = Back to main menu")
+        print("4 = Filter by date range")
+        print("5 = Filter by input path prefix")
+        print("6 = Filter by detected Hz range")
+        print("7 = Back to main menu")
         choice = input("Your choice: ").strip()
 
-        rows = list_all_converted()
-
-        if choice == "1":
-            pass
-        elif choice == "2":
-            try:
-                hz_filter = float(input("Enter target Hz to filter by: "))
-            except ValueError:
-                print("Invalid input!")
+        filters = {}
+        try:
+            if choice == "1":
+                pass
+            elif choice == "2":
+                filters["target_hz"] = float(input("Enter target Hz to filter by: "))
+            elif choice == "3":
+                filters["output_ext"] = input("Enter file extension (e.g., .mp3): ").strip()
+            elif choice == "4":
+                filters["since"], filters["until"] = parse_date_range(
+                    input("Enter date or date range (YYYY-MM-DD [YYYY-MM-DD]): "))
+            elif choice == "5":
+                filters["input_prefix"] = input("Enter input path prefix: ").strip()
+            elif choice == "6":
+                low, high = input("Enter detected Hz range (e.g., 438 442): ").split()
+                filters["min_detected_hz"], filters["max_detected_hz"] = float(low), float(high)
+            elif choice == "7":
+                return
+            else:
+                print("Invalid choice!")
                 continue
-            rows = [r for r in rows if abs(r[4] - hz_filter) < 0.01]
-        elif choice == "3":
-            ext_filter = input("Enter file extension (e.g., .mp3): ").lower()
-            rows = [r for r in rows if r[2].lower().endswith(ext_filter)]
-        elif choice == "4":
-            return
-        else:
-            print("Invalid choice!")
+        except ValueError:
+            print("Invalid input!")
             continue
 
-        if not rows:
+        total = count_conversions(**filters)
+        if not total:
             print("\nNo conversions found for this filter. \n")
-        else:
-            for idx, row in enumerate(rows, 1):
+            continue
+
+        shown = 0
+        for rows in query_conversions(**filters):
+            for row in rows:
+                shown += 1
                 print(f"""
 
-{idx})
+{shown})
 ID:          {row[0]}
 Input file:  {row[1]}
 Output file: {row[2]}
 Detected Hz: {row[3]}
 Target Hz:   {row[4]}
 Timestamp:   {row[5]}
+Status:      {row[8]}
+Output size: {"n/a" if row[6] is None else f"{row[6] / 1e6:.1f} MB"}
+Stages (s):  {row[7] or "n/a"}
 -----------------------------""")
+            if shown < total:
+                more = input(f"\nShown {shown}/{total}. Enter = next page, q = stop: ").strip().lower()
+                if more == "q":
+                    break
+        else:
             input("\nPress Enter to continue...")
 
+#   --------------------
+#   Statistieken
+#   --------------------
+def conversion_statistics(since=None, until=None):
+    """
+    Throughput and reliability figures for capacity planning, computed with SQL aggregates.
+
+    Returns a dict with "overall" (files, failure rate, files per active hour,
+    peak hour, audio hours, bytes) and "per_format" (per output format: files,
+    average real-time factor and average stage times of converted files).
+    """
+    where, params = history_filter_sql(since=since, until=until)
+    converted = (" AND " if where else " WHERE ") + "status = 'converted' AND duration_s > 0"
+    with db_cursor() as cur:
+        files, failed, cached, copied, audio_hours, input_bytes, output_bytes, first, last = cur.execute(f"""
+        SELECT COUNT(*), SUM(status IN ('failed', 'invalid')), SUM(status = 'cached'), SUM(status = 'copied'),
+               SUM(duration_s) / 3600.0, SUM(input_bytes), SUM(output_bytes),
+               MIN(timestamp), MAX(timestamp)
+        FROM converted_files{where}
+        """, params).fetchone()
+        # Uren waarin iets geconverteerd is (YYYY-MM-DDTHH)
+        active_hours, peak_hour = cur.execute(f"""
+        SELECT COUNT(*), MAX(files) FROM (
+            SELECT COUNT(*) AS files FROM converted_files{where}
+            GROUP BY substr(timestamp, 1, 13))
+        """, params).fetchone()
+        per_format = cur.execute(f"""
+        SELECT output_ext, codec, COUNT(*), AVG(total_s / duration_s), AVG(duration_s),
+               AVG(ingest_s), AVG(analyse_s), AVG(decode_s), AVG(shift_s), AVG(encode_s), AVG(stream_s)
+        FROM converted_files{where}{converted}
+        GROUP BY output_ext, codec
+        ORDER BY COUNT(*) DESC
+        """, params).fetchall()
+
+    return {
+        "overall": {
+            "files": files,
+            "failed": failed or 0,
+            "cached": cached or 0,
+            "copied": copied or 0,
+            "failure_rate": (failed or 0) / files if files else None,
+            "files_per_active_hour": files / active_hours if active_hours else None,
+            "peak_files_per_hour": peak_hour,
+            "audio_hours": audio_hours,
+            "input_bytes": input_bytes,
+            "output_bytes": output_bytes,
+            "first": first,
+            "last": last,
+        },
+        "per_format": [
+            dict(zip(("output_ext", "codec", "files", "avg_rtf", "avg_duration_s", "avg_ingest_s",
+                      "avg_analyse_s", "avg_decode_s", "avg_shift_s", "avg_encode_s", "avg_stream_s"), row))
+            for row in per_format
+        ],
+    }
+
+def print_statistics(stats):
+    """Print conversion_statistics() as a small report."""
+    overall = stats["overall"]
+    if not overall["files"]:
+        print("\nNo conversions recorded yet.")
+        return
+
+    def fmt(value, spec=".2f", unit="", scale=1):
+        return "n/a" if value is None else f"{value * scale:{spec}}{unit}"
+
+    print(f"""
+--- Conversion Statistics ---
+Period:              {overall["first"]} .. {overall["last"]}
+Files:               {overall["files"]} ({overall["cached"]} from cache, {overall["copied"]} already at target)
+Failure rate:        {fmt(overall["failure_rate"], ".1f", " %", 100)} ({overall["failed"]} files)
+Files/hour (active): {fmt(overall["files_per_active_hour"], ".1f")}
+Peak files/hour:     {fmt(overall["peak_files_per_hour"], "d")}
+Audio converted:     {fmt(overall["audio_hours"], ".2f", " h")}
+Input size:          {fmt(overall["input_bytes"], ".1f", " MB", 1e-6)}
+Output size:         {fmt(overall["output_bytes"], ".1f", " MB", 1e-6)}""")
+
+    if stats["per_format"]:
+        print(f"\n{'format':<7} {'codec':<10} {'files':>6} {'avg RTF':>8} {'shift s':>8} {'encode s':>9}")
+        for row in stats["per_format"]:
+            print(f"{row['output_ext'] or '?':<7} {row['codec'] or '?':<10} {row['files']:>6} "
+                  f"{fmt(row['avg_rtf'], '.3f'):>8} {fmt(row['avg_shift_s'], '.2f'):>8} "
+                  f"{fmt(row['avg_encode_s'], '.2f'):>9}")
+
+def stats_cli(argv):
+    """`stats` command: print or export conversion statistics; returns the exit code."""
+    parser = argparse.ArgumentParser(prog="stats", description="Conversion throughput and failure statistics.")
+    parser.add_argument("--since", help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--until", help="last day to include (YYYY-MM-DD)")
+    parser.add_argument("--json", help="write the statistics to this JSON file")
+    args = parser.parse_args(argv)
+    try:
+        since = parse_date_range(args.since)[0] if args.since else None
+        until = parse_date_range(args.until)[1] if args.until else None
+    except ValueError:
+        parser.error("dates must be YYYY-MM-DD")
+
+    init_database()
+    stats = conversion_statistics(since, until)
+    print_statistics(stats)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(stats, f, indent=2)
+        print(f"Statistics saved to {args.json}")
+    return 0
+
 #   --------------------
 #   Quality functies
 #   --------------------
 
+#   Kwaliteit presets (low / medium / high) per formaat
+QUALITY_PRESETS = {
+    ".flac": {"low": ["-compression_level", "0"], "medium": ["-compression_level", "5"],
+              "high": ["-compression_level", "8"]},
+    ".mp3": {"low": ["-b:a", "128"], "medium": ["-b:a", "192"], "high": ["-b:a", "320"]},
+}
+
+def quality_flags_for(output_format, quality="high"):
+    """
+    Non-interactive version of choose_quality: ffmpeg flags for a preset
+    name, with the encoder picked by output_encoder (e.g. libmp3lame).
+    """
+    presets = QUALITY_PRESETS.get(output_format)
+    if not presets:
+        return []
+    if quality not in presets:
+        raise ValueError(f"Unknown quality '{quality}', use low, medium or high")
+    encoder = output_encoder(output_format)
+    return (["-c:a", encoder] if encoder else []) + list(presets[quality])
+
 #   Kwaliteit kiezen
 def choose_quality(output_format):
     """
@@ -138,32 +1025,27 @@ def choose_quality(output_format):
         print("2 = Medium compression")
         print("3 = High compression")
         choice = input("Your choice (press Enter for default high quality): ").strip()
-        level_map = {"1": "0", "2": "5", "3": "8"}
-        level = level_map.get(choice, "8")
-        return ["-compression_level", level]
     elif output_format == ".mp3":
         print("\nChoose MP3 quality:")
         print("1 = Low (128 kbps)")
         print("2 = Medium (192 kbps)")
         print("3 = High (320 kbps, default)")
         choice = input("Your choice (press Enter for default high quality): ").strip()
-        bitrate_map = {"1": "128", "2": "192", "3": "320"}
-        bitrate = bitrate_map.get(choice, "320")
-        return ["-b:a", bitrate]
     else:
         return []
+    return quality_flags_for(output_format, {"1": "low", "2": "medium"}.get(choice, "high"))
 
 #   --------------------
 #   Audio Functies
 #   --------------------
 
 #   Sample analysis - 1
-def extract_sample(input_file, duration=3):
+def extract_sample(input_file, duration=3, start=0.0):
     """Extract a short audio sample for analysis with a unique temp file."""
-    base_name = os.path.splitext(os.path.basename(input_file))[0]
-    sample_file = f"temp_sample_{base_name}.wav"
+    sample_file = temp_name(input_file, "_sample")
     subprocess.run([
-        FFMPEG_PATH, "-y",
+        tool_path("ffmpeg"), "-y",
+        "-ss", f"{start:.3f}",  # voor -i: snel zoeken in de input
         "-i", input_file,
         "-t", str(duration),
         "-ac", "1",
@@ -172,19 +1054,327 @@ def extract_sample(input_file, duration=3):
     ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     return sample_file
 
+def probe_duration(input_file):
+    """Duration of the input in seconds (ffprobe), or None if unknown."""
+    result = subprocess.run([
+        tool_path("ffprobe"),
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        input_file
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        return float(result.stdout.decode().strip())
+    except ValueError:
+        return None
+
+def read_segment(input_file, start, duration):
+    """Decode one mono analysis window straight into memory, with fast input seeking."""
+    result = subprocess.run([
+        tool_path("ffmpeg"),
+        "-v", "error",
+        "-ss", f"{start:.3f}",
+        "-i", input_file,
+        "-t", str(duration),
+        "-f", "f32le",
+        "-ac", "1",
+        "-ar", str(SAMPLE_RATE),
+        "-"
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+#   Chunked lezen: vaste blokgrootte, constant geheugen ook voor uren lange opnames
+def open_wav(path):
+    """
+    Open a WAV as (rate, data) without loading it: data is memory-mapped
+    where scipy supports it, otherwise (e.g. 24-bit) read in full.
+    """
+    try:
+        return wavfile.read(path, mmap=True)
+    except ValueError:
+        return wavfile.read(path)
+
+def overlap_blocks(blocks, overlap):
+    """Prefix every block with the last `overlap` frames of the previous one."""
+    tail = None
+    for block in blocks:
+        if overlap and tail is not None:
+            block = np.concatenate((tail, block))
+        if overlap:
+            tail = block[-overlap:]
+        yield block
+
+def iter_wav_blocks(path, block_frames=STREAM_BLOCK_FRAMES, overlap=0):
+    """
+    Yield float32 (frames, channels) blocks of a WAV file, scaled to -1..1.
+
+    Only one block (plus `overlap` frames of the previous block in front
+    of it) is in memory at a time, whatever the length of the file.
+    """
+    rate, data = open_wav(path)
+    try:
+        scale = 1.0 / -np.iinfo(data.dtype).min if data.dtype.kind == "i" else 1.0
+
+        def blocks(samples):
+            for start in range(0, len(samples), block_frames):
+                block = np.asarray(samples[start:start + block_frames], dtype=np.float32)
+                if scale != 1.0:
+                    block *= scale
+                yield block.reshape(len(block), -1)
+
+        yield from overlap_blocks(blocks(data), overlap)
+    finally:
+        data = None  # mmap loslaten
+
+def iter_pcm_blocks(input_file, block_frames=STREAM_BLOCK_FRAMES, overlap=0, channels=CHANNELS,
+                    rate=SAMPLE_RATE):
+    """
+    Like iter_wav_blocks for any input: decode through an ffmpeg f32le pipe
+    and read it in fixed-size blocks. The decoder is stopped when the
+    generator is closed early.
+    """
+    frame_bytes = 4 * channels
+    decoder = subprocess.Popen(
+        [tool_path("ffmpeg"), "-v", "error", "-i", input_file,
+         "-f", "f32le", "-ac", str(channels), "-ar", str(rate), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def blocks():
+        while True:
+            raw = decoder.stdout.read(block_frames * frame_bytes)
+            usable = len(raw) - len(raw) % frame_bytes
+            if not usable:
+                return
+            yield np.frombuffer(raw[:usable], dtype=np.float32).reshape(-1, channels)
+
+    try:
+        yield from overlap_blocks(blocks(), overlap)
+    finally:
+        if decoder.poll() is None:
+            decoder.kill()
+        decoder.stdout.close()
+        decoder.wait()
+
+def segment_starts(duration, segments, segment_seconds):
+    """Start times of analysis windows spread over the file, middle window first."""
+    if not duration or duration <= segment_seconds:
+        return [0.0]
+    latest = duration - segment_seconds
+    starts = [min(latest, max(0.0, (i + 0.5) * duration / segments - segment_seconds / 2))
+              for i in range(segments)]
+    middle = (segments - 1) / 2
+    return [starts[i] for i in sorted(range(segments), key=lambda i: abs(i - middle))]
+
+def estimate_tuning_multi(read, duration, rate=SAMPLE_RATE, segments=None, segment_seconds=None,
+                          min_confidence=None):
+    """
+    Estimate the tuning reference from several short windows across the file.
+
+    `read(start, seconds)` returns the decoded window. Per-window estimates are
+    merged as a confidence-weighted circular mean of their cent offsets.
+    Silent windows are ignored, and reading stops early once two or more
+    windows agree with at least `min_confidence`. Returns (reference_hz, confidence).
+    """
+    segments = segments or SAMPLE_SEGMENTS
+    segment_seconds = segment_seconds or SAMPLE_SEGMENT_SECONDS
+    if min_confidence is None:
+        min_confidence = SAMPLE_MIN_CONFIDENCE
+
+    total = 0j
+    used = 0
+    for start in segment_starts(duration, segments, segment_seconds):
+        data = read(start, segment_seconds)
+        if len(data) == 0:
+            continue
+        ref, confidence = estimate_tuning_reference(data, rate)
+        if confidence <= 0:
+            continue
+        cents = 1200 * math.log2(ref / 440.0)
+        total += confidence * cmath.exp(2j * math.pi * cents / 100)
+        used += 1
+        if used >= 2 and abs(total) / used >= min_confidence:
+            break
+
+    if not used:
+        return 440.0, 0.0
+    z = total / used
+    offset_cents = cmath.phase(z) * 100 / (2 * math.pi)
+    return 440.0 * 2 ** (offset_cents / 1200), abs(z)
+
+def sample_tuning(input_file, ingest=None):
+    """
+    Estimate (reference_hz, confidence) for a file according to SAMPLING_MODE.
+
+    In "multi" mode windows come from the ingest's decoded WAV when there is
+    one (no extra decoding), otherwise from seeking ffmpeg decodes.
+    """
+    if SAMPLING_MODE == "full":
+        # Hele bestand blok voor blok; de streaming decoder is voor de conversie, dus dan apart decoderen
+        if ingest is not None and "wav" in ingest:
+            return estimate_tuning_blocks(iter_wav_blocks(ingest["wav"], overlap=2048), ingest["rate"])
+        return estimate_tuning_blocks(iter_pcm_blocks(input_file, overlap=2048), SAMPLE_RATE)
+
+    if SAMPLING_MODE != "multi":
+        if ingest is not None:
+            return estimate_tuning_reference(ingest["sample"], ingest["rate"])
+        sample_wav = extract_sample(input_file)
+        try:
+            rate, data = wavfile.read(sample_wav)
+            return estimate_tuning_reference(data, rate)
+        finally:
+            if os.path.exists(sample_wav):
+                os.remove(sample_wav)
+
+    if ingest is not None and "wav" in ingest:
+        rate, data = open_wav(ingest["wav"])
+
+        def read(start, seconds):
+            return np.array(data[int(start * rate):int((start + seconds) * rate)])
+
+        try:
+            return estimate_tuning_multi(read, len(data) / rate, rate)
+        finally:
+            del data  # mmap loslaten
+
+    return estimate_tuning_multi(lambda start, seconds: read_segment(input_file, start, seconds),
+                                 probe_duration(input_file))
+
 #   Sample analysis - 2
 def estimate_tuning(sample_file):
-    """Estimate average tuning frequency of audio (Hz)."""
-    rate, data = wavfile.read(sample_file)
-    if len(data.shape) > 1: # stereo -> mono
-        data = data.mean(axis=1)
-    #Take FFT
-    fft = np.fft.rfft(data)
-    freqs = np.fft.rfftfreq(len(data), 1/rate)
-    magnitude = np.abs(fft)
-    peak_idx = np.argmax(magnitude)
-    fundamental = freqs[peak_idx]
-    return fundamental
+    """Estimate average tuning frequency of audio (Hz); only the analysed frames are read."""
+    rate, data = open_wav(sample_file)
+    try:
+        return estimate_tuning_reference(data, rate)[0]
+    finally:
+        del data  # mmap loslaten
+
+def estimate_tuning_reference(data, rate, n_fft=4096, max_frames=32, fmin=100.0, fmax=5000.0):
+    """
+    Estimate the tuning reference of A4 and a confidence value (0-1).
+
+    Runs a Hann-windowed STFT over (at most max_frames) frames spread across
+    the sample, refines every spectral peak with parabolic interpolation and
+    folds the peaks onto their cent deviation from the 440 Hz 12-TET grid.
+    The weighted circular mean of those deviations is the tuning offset.
+    Because of the folding the result lies within +-50 cents of 440 Hz
+    (about 427.5-452.9 Hz); use tuning_reference_for to compare targets.
+    Only the selected frames are read, so `data` may be a memory map.
+    """
+    return tuning_from_phasors(*tuning_phasors(data, rate, n_fft, max_frames, fmin, fmax))
+
+def estimate_tuning_blocks(blocks, rate, n_fft=4096, fmin=100.0, fmax=5000.0):
+    """
+    estimate_tuning_reference over a whole recording, block by block (see
+    iter_wav_blocks / iter_pcm_blocks), in constant memory. Blocks should
+    overlap by about n_fft // 2 frames so no frame is lost at a boundary.
+    """
+    total, weight = 0j, 0.0
+    for block in blocks:
+        # Alle frames van het blok (hop n_fft / 2), niet alleen een selectie
+        frames = max(1, (len(block) - n_fft) // (n_fft // 2) + 1)
+        block_total, block_weight = tuning_phasors(block, rate, n_fft, frames, fmin, fmax)
+        total += block_total
+        weight += block_weight
+    return tuning_from_phasors(total, weight)
+
+def tuning_from_phasors(total, weight):
+    """(reference_hz, confidence) from the summed peak phasors of tuning_phasors."""
+    if weight <= 0:
+        return 440.0, 0.0
+    z = total / weight
+    offset_cents = np.angle(z) * 100 / (2 * np.pi)
+    return 440.0 * 2 ** (offset_cents / 1200), float(np.abs(z))
+
+def tuning_phasors(data, rate, n_fft=4096, max_frames=32, fmin=100.0, fmax=5000.0):
+    """
+    Peak analysis behind estimate_tuning_reference: returns the sum of
+    weight * exp(i * cent angle) over all spectral peaks and the sum of
+    their weights, so results of several blocks can be added up.
+    """
+    length = len(data)
+    # Frames gelijkmatig over de hele sample verdeeld; alleen die frames inlezen
+    n_frames = max(1, min(max_frames, (length - n_fft) // (n_fft // 2) + 1))
+    starts = np.linspace(0, max(0, length - n_fft), n_frames).astype(np.intp)
+    frames = np.zeros((n_frames, n_fft), dtype=np.float32)
+    for i, start in enumerate(starts):
+        frame = np.asarray(data[start:start + n_fft], dtype=np.float32)
+        if frame.ndim > 1:  # stereo -> mono
+            frame = frame.mean(axis=1)
+        frames[i, :len(frame)] = frame
+    frames *= np.hanning(n_fft).astype(np.float32)
+
+    magnitude = np.abs(np.fft.rfft(frames, axis=-1))
+    lo = max(1, int(fmin * n_fft / rate))
+    hi = min(magnitude.shape[1] - 1, int(fmax * n_fft / rate))
+    log_mag = np.log(magnitude[:, lo - 1:hi + 1] + 1e-12)
+    a, b, c = log_mag[:, :-2], log_mag[:, 1:-1], log_mag[:, 2:]
+
+    # Pieken: lokaal maximum, max 40 dB onder de sterkste piek van het frame
+    # en niet in (bijna) stille frames
+    peak_mag = magnitude[:, lo:hi]
+    frame_max = peak_mag.max(axis=1, keepdims=True)
+    is_peak = ((b > a) & (b >= c)
+               & (peak_mag > frame_max * 0.01)
+               & (frame_max > magnitude.max() * 1e-3))
+    if not is_peak.any():
+        return 0j, 0.0
+
+    # Parabolische interpolatie op log-magnitude
+    denom = a - 2 * b + c
+    offset = np.where(denom < 0, 0.5 * (a - c) / np.where(denom < 0, denom, -1.0), 0.0)
+    bins = np.arange(lo, hi)[None, :] + offset
+    freqs = bins[is_peak] * rate / n_fft
+    weights = peak_mag[is_peak]
+
+    # Cent-afwijking t.o.v. 12-TET (440 Hz), circulair gemiddeld over 100 cent
+    cents = 1200 * np.log2(freqs / 440.0)
+    angles = 2 * np.pi * cents / 100
+    return complex(np.sum(weights * np.exp(1j * angles))), float(np.sum(weights))
+
+def tuning_reference_for(target_hz):
+    """Fold a target frequency onto the reference range estimate_tuning_reference reports."""
+    cents = 1200 * math.log2(target_hz / 440.0)
+    cents -= 100 * round(cents / 100)
+    return 440.0 * 2 ** (cents / 1200)
+
+def target_shift_cents(detected_hz, target_hz):
+    """
+    Shift in cents from the detected tuning to the target, not folded: the
+    pipeline shifts by the whole interval, so 880 Hz is 1200 cents from a
+    440 Hz file, not 0.
+    """
+    return 1200 * math.log2(target_hz / detected_hz)
+
+def near_target_action(detected_hz, confidence, target_hz, near_target):
+    """
+    What to do with a file: "convert", or for a file already within
+    NEAR_TARGET_CENTS of the target the near_target policy: "copy" (output
+    the input unchanged), "skip" or "convert". near_target "ask" prompts.
+    """
+    cents = target_shift_cents(detected_hz, target_hz)
+    if confidence <= 0 or abs(cents) >= NEAR_TARGET_CENTS:
+        return "convert"
+    print(f"⚠️ File is already close to target ({detected_hz:.2f} Hz ~ {target_hz} Hz, {cents:+.1f} cents).")
+    if near_target == "ask":
+        answer = input("Convert anyway, copy it unchanged or skip? (y/c/n): ").strip().lower()
+        return {"y": "convert", "c": "copy"}.get(answer, "skip")
+    return near_target
+
+def likely_near_target(input_file, targets, seconds=3):
+    """
+    Cheap first look before the full decode of the WAV pipeline: estimate
+    the tuning of the opening `seconds` only (one short decode) and return
+    the targets it puts within 2 x NEAR_TARGET_CENTS. Only for those is
+    the full sample_tuning worth running before the decode; a silent or
+    ambiguous opening returns none and the file goes the normal route.
+    """
+    data = read_segment(input_file, 0.0, seconds)
+    if len(data) == 0:
+        return []
+    detected_hz, confidence = estimate_tuning_reference(data, SAMPLE_RATE)
+    if confidence <= 0:
+        return []
+    return [t for t in targets if abs(target_shift_cents(detected_hz, t)) < 2 * NEAR_TARGET_CENTS]
 
 #   Validatie audio file
 def validate_audio_file(input_file):
@@ -195,7 +1385,7 @@ def validate_audio_file(input_file):
 
     print("Checking file validity...")
     result = subprocess.run([
-        FFMPEG_PATH,
+        tool_path("ffmpeg"),
         "-v", "error",
         "-i", input_file,
         "-f", "null",
@@ -209,6 +1399,89 @@ def validate_audio_file(input_file):
     print("✔️ Audio file is valid.")
     return True
 
+#   Single-pass ingest
+def ingest_audio(input_file, analysis_seconds=3, streaming=None, scratch_copies=2):
+    """
+    Decode the input once: validates the file, captures the first
+    `analysis_seconds` for estimate_tuning and keeps the decoded audio for
+    the conversion step.
+
+    Returns an ingest dict with "rate" and "sample", plus "wav"/"frames"/
+    "scratch" (decoded temp WAV in its own scratch directory) or
+    "decoder"/"head" (running PCM pipe, streaming mode). Returns None
+    if the file is missing or not valid audio. Always release the result
+    with close_ingest. `scratch_copies` is the number of decoded-size WAVs
+    reserved in scratch space (decoded + shifted outputs).
+    """
+    if streaming is None:
+        streaming = STREAMING_PIPELINE
+    if not os.path.exists(input_file):
+        print("❌ Error: File does not exist.")
+        return None
+
+    frame_bytes = 4 * CHANNELS
+    window = int(analysis_seconds * SAMPLE_RATE)
+
+    if streaming:
+        err = tempfile.TemporaryFile()
+        decoder = subprocess.Popen(
+            [tool_path("ffmpeg"), "-v", "error", "-i", input_file,
+             "-f", "f32le", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE), "-"],
+            stdout=subprocess.PIPE, stderr=err)
+        head = decoder.stdout.read(window * frame_bytes)
+        ingest = {"decoder": decoder, "err": err, "head": head, "rate": SAMPLE_RATE}
+        if len(head) < window * frame_bytes and decoder.wait() != 0:
+            print("❌ Error: File is not a valid audio file or is corrupted.")
+            close_ingest(ingest)
+            return None
+        usable = len(head) - len(head) % frame_bytes
+        ingest["sample"] = np.frombuffer(head[:usable], dtype=np.float32).reshape(-1, CHANNELS)
+        return ingest
+
+    # Eigen scratch map met ruimte voor de gedecodeerde en de verschoven WAV
+    scratch = new_scratch_dir("ingest", estimate_decoded_bytes(input_file, copies=scratch_copies))
+    temp_wav = temp_name(input_file, folder=scratch)
+    print("Decoding input (validate, analyse and convert in one pass)...")
+    result = subprocess.run([
+        tool_path("ffmpeg"), "-y",
+        "-v", "error",
+        "-i", input_file,
+        "-ac", str(CHANNELS),
+        "-ar", str(SAMPLE_RATE),
+        temp_wav
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if result.returncode != 0:
+        print("❌ Error: File is not a valid audio file or is corrupted.")
+        release_scratch_dir(scratch)
+        return None
+
+    rate, data = open_wav(temp_wav)
+    sample = np.array(data[:int(analysis_seconds * rate)])
+    frames = len(data)
+    del data  # mmap loslaten zodat de temp WAV later verwijderd kan worden
+    print("✔️ Audio file is valid.")
+    return {"wav": temp_wav, "scratch": scratch, "rate": rate, "sample": sample, "frames": frames}
+
+def close_ingest(ingest):
+    """Stop a pending decoder and remove the decoded temp WAV and its scratch directory, if any."""
+    if not ingest:
+        return
+    decoder = ingest.get("decoder")
+    if decoder is not None:
+        if decoder.poll() is None:
+            decoder.kill()
+        decoder.stdout.close()
+        decoder.wait()
+        ingest["err"].close()
+    wav = ingest.get("wav")
+    if wav and os.path.exists(wav):
+        try:
+            os.remove(wav)
+        except OSError:
+            pass
+    release_scratch_dir(ingest.get("scratch"))
+
 #   ------------------
 #   Audio conversie functies
 #   ------------------
@@ -223,7 +1496,7 @@ def convert_to_wav(input_file, temp_wav="temp_input.wav"):
     """Convert any audio file to WAV using ffmpeg."""
     print("Converting input to WAV...")
     cmd = [
-        FFMPEG_PATH, "-y",
+        tool_path("ffmpeg"), "-y",
         "-i", input_file,
         "-ac", "2",
         "-ar", "44100",
@@ -233,12 +1506,14 @@ def convert_to_wav(input_file, temp_wav="temp_input.wav"):
         return None
     return temp_wav
 
-#   Stap 2: Pitch Shift met Rubberband
+#   Stap 2: Pitch Shift met Rubberband of de ingebouwde phase vocoder
 def pitch_shift_wav(input_wav, output_wav="temp_shifted.wav", semitone_shift=0.0):
-    """Pitch shift WAV using Rubberband CLI."""
+    """Pitch shift WAV using the PITCH_BACKEND: Rubberband CLI or the built-in vocoder."""
     print(f"Applying pitch shift ({semitone_shift:+.6f} semitones)...")
+    if PITCH_BACKEND == "vocoder":
+        return vocoder_shift(input_wav, output_wav, semitones_to_ratio(semitone_shift))
     cmd = [
-        RUBBERBAND_PATH, "--pitch",
+        tool_path("rubberband"), "--pitch",
         str(semitone_shift),
         input_wav, output_wav
     ]
@@ -246,105 +1521,1615 @@ def pitch_shift_wav(input_wav, output_wav="temp_shifted.wav", semitone_shift=0.0
         return None
     return output_wav
 
+#   Vocoder shifts die tegelijk lopen in aparte processen: de NumPy DSP houdt grotendeels de GIL vast
+_dsp_pool = None
+_dsp_lock = threading.Lock()
+_vocoder_active = 0
+
+def dsp_pool():
+    """Process pool (spawn) of DEFAULT_WORKERS processes for in-process DSP, created on first use."""
+    global _dsp_pool
+    with _dsp_lock:
+        if _dsp_pool is None:
+            _dsp_pool = ProcessPoolExecutor(max_workers=DEFAULT_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_dsp_pool.shutdown, cancel_futures=True)
+    return _dsp_pool
+
+def vocoder_shift(input_wav, output_wav, ratio):
+    """
+    vocoder_shift_wav for the batch threads: the first shift runs on the
+    calling thread, shifts that overlap with it run in dsp_pool, so
+    parallel workers use more than one core without slowing down a
+    sequential run with process start-up.
+    """
+    global _vocoder_active
+    with _dsp_lock:
+        inline = _vocoder_active == 0
+        _vocoder_active += 1
+    try:
+        if inline:
+            return vocoder_shift_wav(input_wav, output_wav, ratio)
+        return dsp_pool().submit(vocoder_shift_wav, input_wav, output_wav, ratio, VOCODER_PRESET).result()
+    finally:
+        with _dsp_lock:
+            _vocoder_active -= 1
+
+def vocoder_shift_wav(input_wav, output_wav, ratio, preset=None):
+    """
+    Pitch shift a WAV in-process with OfflinePitchShifter, block by block
+    (constant memory), writing a 16-bit WAV. Returns output_wav or None.
+    """
+    try:
+        rate, data = open_wav(input_wav)
+        channels = 1 if data.ndim == 1 else data.shape[1]
+        del data
+        shifter = OfflinePitchShifter(ratio, channels=channels, **OFFLINE_PRESETS[preset or VOCODER_PRESET])
+
+        def write(out, block):
+            out.writeframes((np.clip(block, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+
+        with wave.open(output_wav, "wb") as out:
+            out.setnchannels(channels)
+            out.setsampwidth(2)
+            out.setframerate(rate)
+            for block in iter_wav_blocks(input_wav):
+                write(out, shifter.process(block))
+            write(out, shifter.flush())
+        return output_wav
+    except (OSError, ValueError, wave.Error) as e:
+        print(f"\n❌ Error during pitch shift:\n{e}")
+        return None
+
 #   Stap 3: WAV -> eindformat
-def export_final(output_wav, output_file):
+def export_final(output_wav, output_file, quality_flags=None):
     """Convert WAV back into chosen format using ffmpeg with quality options."""
     print("Exporting final file:", output_file)
-    quality_flags = choose_quality(os.path.splitext(output_file)[1].lower())
-    cmd = [FFMPEG_PATH, "-y",
+    if quality_flags is None:
+        quality_flags = choose_quality(os.path.splitext(output_file)[1].lower())
+    cmd = [tool_path("ffmpeg"), "-y",
            "-i", output_wav
            ] + quality_flags + [output_file]
     if not run_subprocess(cmd, "final export"):
         print("⚠️ Export failed.")
+        return None
+    return output_file
+
+#   Snelle route: input zit al op de target tuning
+def copy_to_output(input_file, output_file, quality_flags=None):
+    """
+    Write the input unchanged as output, atomically: a stream copy (ffmpeg
+    -c copy, no re-encode) when the container stays the same, otherwise
+    only a transcode. Returns "copy" or "transcode", or None on failure.
+    """
+    same_container = os.path.splitext(input_file)[1].lower() == output_ext_of(output_file)
+    if quality_flags is None and not same_container:
+        quality_flags = choose_quality(output_ext_of(output_file))
+    partial = partial_output_path(output_file)
+    codec_flags = ["-map", "0", "-c", "copy"] if same_container else quality_flags
+    print(f"{'Copying' if same_container else 'Transcoding'} without pitch shift: {output_file}")
+    try:
+        if not run_subprocess([tool_path("ffmpeg"), "-y", "-v", "error", "-i", input_file] + codec_flags + [partial],
+                              "copy" if same_container else "transcode"):
+            return None
+        publish_output(partial, output_file)
+        return "copy" if same_container else "transcode"
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+def copy_result(result, file_path, output_file, quality_flags):
+    """Run copy_to_output for a batch result dict: status "copied", codec "copy" for a stream copy."""
+    start = time.perf_counter()
+    mode = copy_to_output(file_path, output_file, quality_flags)
+    result["stats"]["copy_s"] = time.perf_counter() - start
+    if mode:
+        result.update(output_path=output_file, status="copied")
+        if mode == "copy":
+            result["codec"] = "copy"
+    else:
+        same_container = output_ext_of(output_file) == output_ext_of(file_path)
+        result["error"] = "stream copy failed" if same_container else "transcode failed"
+
+#   Streaming pipeline (geen temp bestanden)
+def convert_audio_streaming(input_file, output_file, target_hz, quality_flags=None, ingest=None, stats=None):
+    """
+    Decode with ffmpeg to raw PCM on stdout, pitch shift in-process and pipe
+    the result straight into an ffmpeg encoder. Continues an existing
+    streaming ingest when given. Returns True on success.
+
+    When `stats` is a dict it receives stream_s (whole pipe), shift_s (time
+    spent in the pitch shifter), audio_frames and temp_bytes (always 0).
+    """
+    print(f"Starting 440 Hz -> {target_hz} Hz streaming conversion...")
+    stream_start = time.perf_counter()
+    shift_s = 0.0
+    frames_in = 0
+    if quality_flags is None:
+        quality_flags = choose_quality(os.path.splitext(output_file)[1].lower())
+
+    own_ingest = ingest is None
+    if own_ingest:
+        ingest = ingest_audio(input_file, analysis_seconds=0, streaming=True)
+        if ingest is None:
+            return False
+    decoder = ingest["decoder"]
+
+    pcm_flags = ["-f", "f32le", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE)]
+    partial = partial_output_path(output_file)
+    shifter = StreamingPitchShifter(target_hz / 440.0, channels=CHANNELS, fft_size=4096, overlap=8)
+    frame_bytes = 4 * CHANNELS
+    out_block = np.empty((max(STREAM_BLOCK_FRAMES, len(ingest["head"]) // frame_bytes), CHANNELS),
+                         dtype=np.float32)
+    to_skip = shifter.latency  # vertraging van de shifter eraf knippen
+
+    with tempfile.TemporaryFile() as enc_err:
+        encoder = subprocess.Popen(
+            [tool_path("ffmpeg"), "-y", "-v", "error"] + pcm_flags + ["-i", "-"] + quality_flags + [partial],
+            stdin=subprocess.PIPE, stderr=enc_err)
+
+        def write_block(raw):
+            nonlocal to_skip, shift_s, frames_in
+            usable = len(raw) - len(raw) % frame_bytes
+            block = np.frombuffer(raw[:usable], dtype=np.float32).reshape(-1, CHANNELS)
+            frames_in += len(block)
+            shift_start = time.perf_counter()
+            shifted = shifter.process(block, out_block[:len(block)])
+            shift_s += time.perf_counter() - shift_start
+            skip = min(to_skip, len(shifted))
+            to_skip -= skip
+            encoder.stdin.write(shifted[skip:].tobytes())
+
+        try:
+            # Analyse-venster van de ingest eerst, daarna de rest van de decode
+            write_block(ingest["head"])
+            while True:
+                raw = decoder.stdout.read(STREAM_BLOCK_FRAMES * frame_bytes)
+                if not raw:
+                    break
+                write_block(raw)
+            # Staart van de shifter leegmaken
+            write_block(bytes(shifter.latency * frame_bytes))
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            decoder.stdout.close()
+            decoder.wait()
+            try:
+                encoder.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            encoder.wait()
+
+        try:
+            for proc, err, description in ((decoder, ingest["err"], "streaming decode"),
+                                           (encoder, enc_err, "streaming encode")):
+                if proc.returncode != 0:
+                    err.seek(0)
+                    print(f"\n❌ Error during {description}:")
+                    print(err.read().decode("utf-8", errors="replace"))
+                    if os.path.exists(partial):
+                        os.remove(partial)
+                    return False
+        finally:
+            if own_ingest:
+                close_ingest(ingest)
+
+    if stats is not None:
+        # Zonder de staart van de shifter
+        stats.update(stream_s=time.perf_counter() - stream_start, shift_s=shift_s,
+                     audio_frames=frames_in - shifter.latency, temp_bytes=0)
+    publish_output(partial, output_file)
+    print("Done! Converted file saved as:", output_file)
+    return True
 
 #   Full conversion pipeline
-def convert_audio_440_to_target(input_file, output_file, target_hz):
-    print(f"Starting 440 Hz -> {target_hz} Hz conversion...")
+def convert_audio_440_to_target(input_file, output_file, target_hz, quality_flags=None, streaming=None,
+                                ingest=None, stats=None):
+    """
+    Run WAV conversion, pitch shift and export. Returns True on success.
 
-    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    Pass the result of ingest_audio as `ingest` to reuse its decode instead of
+    decoding the input again. When `stats` is a dict it receives the wall
+    time per stage (decode_s, shift_s, encode_s), audio_frames and
+    temp_bytes written.
+    """
+    if ingest is not None:
+        streaming = "decoder" in ingest
+    elif streaming is None:
+        streaming = STREAMING_PIPELINE
+    if streaming:
+        return convert_audio_streaming(input_file, output_file, target_hz, quality_flags, ingest, stats)
+
+    print(f"Starting 440 Hz -> {target_hz} Hz conversion...")
 
-    temp_wav = f"temp_{base_name}.wav"
-    shifted_wav = f"temp_{base_name}_shifted.wav"
+    # Zonder ingest een eigen scratch map (met ruimte voor beide WAV's)
+    own_scratch = None if ingest else new_scratch_dir("convert", estimate_decoded_bytes(input_file, copies=2))
+    scratch = ingest["scratch"] if ingest else own_scratch
+    temp_wav = ingest["wav"] if ingest else temp_name(input_file, folder=scratch)
+    shifted_wav = temp_name(input_file, "_shifted", folder=scratch)
+    partial = partial_output_path(output_file)
+    if stats is None:
+        stats = {}
+    stats.setdefault("temp_bytes", 0)
 
     try:
-        # 1. Input naar WAV
-        convert_to_wav(input_file, temp_wav)
+        # 1. Input naar WAV (overslaan als de ingest al gedecodeerd heeft)
+        if not ingest:
+            start = time.perf_counter()
+            if not convert_to_wav(input_file, temp_wav):
+                return False
+            stats["decode_s"] = time.perf_counter() - start
+            stats["temp_bytes"] += os.path.getsize(temp_wav)
+            rate, data = open_wav(temp_wav)
+            stats["audio_frames"] = len(data)
+            del data
+        else:
+            stats["audio_frames"] = ingest["frames"]
 
         # 2. Pitch shift
+        start = time.perf_counter()
         semitones = semitone_shift_for_target(target_hz)
-        pitch_shift_wav(temp_wav, shifted_wav, semitone_shift=semitones)
+        if not pitch_shift_wav(temp_wav, shifted_wav, semitone_shift=semitones):
+            return False
+        stats["shift_s"] = time.perf_counter() - start
+        stats["temp_bytes"] += os.path.getsize(shifted_wav)
 
         # 3. WAV naar eindbestand
-        export_final(shifted_wav, output_file)
+        start = time.perf_counter()
+        if not export_final(shifted_wav, partial, quality_flags):
+            return False
+        publish_output(partial, output_file)
+        stats["encode_s"] = time.perf_counter() - start
 
         print("Done! Converted file saved as:", output_file)
+        return True
 
     finally:
         # 4. Opschonen
-        for f in (temp_wav, shifted_wav):
+        for f in (temp_wav, shifted_wav, partial):
             try:
                 if f and os.path.exists(f):
                     os.remove(f)
             except:
                 pass
+        release_scratch_dir(own_scratch)
+
+#   --------------------
+#   Multi-target fan-out
+#   --------------------
+def export_atomic(input_wav, output_file, quality_flags):
+    """export_final via a partial file; returns (ok, encode seconds)."""
+    start = time.perf_counter()
+    partial = partial_output_path(output_file)
+    try:
+        if not export_final(input_wav, partial, quality_flags):
+            return False, time.perf_counter() - start
+        publish_output(partial, output_file)
+        return True, time.perf_counter() - start
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+def fanout_target(input_file, temp_wav, scratch, target_hz, exports, quality_by_ext):
+    """
+    Pitch shift the decoded WAV once for target_hz and encode every
+    (output_ext, output_file) in `exports` from it, in parallel.
+    Returns {output_file: (ok, stats)}.
+    """
+    shifted_wav = temp_name(input_file, f"_shifted_{target_hz}", folder=scratch)
+    start = time.perf_counter()
+    ok = pitch_shift_wav(temp_wav, shifted_wav, semitone_shift_for_target(target_hz))
+    shift_s = time.perf_counter() - start
+    try:
+        if not ok:
+            return {output_file: (False, {"shift_s": shift_s}) for _, output_file in exports}
+        with ThreadPoolExecutor(max_workers=len(exports)) as pool:
+            futures = {pool.submit(export_atomic, shifted_wav, output_file, quality_by_ext[ext]): output_file
+                       for ext, output_file in exports}
+        outcome = {}
+        for future, output_file in futures.items():
+            ok, encode_s = future.result()
+            outcome[output_file] = (ok, {"shift_s": shift_s, "encode_s": encode_s})
+        return outcome
+    finally:
+        if os.path.exists(shifted_wav):
+            os.remove(shifted_wav)
+
+def convert_fanout_streaming(input_file, plan, quality_by_ext, ingest):
+    """
+    Streaming fan-out: one ffmpeg decode pipe feeds one in-process pitch
+    shifter thread per target, and every shifted block goes straight into
+    one ffmpeg encoder per output format. Returns {output_file: (ok, stats)}.
+    """
+    decoder = ingest["decoder"]
+    frame_bytes = 4 * CHANNELS
+    pcm_flags = ["-f", "f32le", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE)]
+    max_frames = max(STREAM_BLOCK_FRAMES, len(ingest["head"]) // frame_bytes)
+    start = time.perf_counter()
+
+    lanes = []
+    for target_hz, exports in plan.items():
+        shifter = StreamingPitchShifter(target_hz / 440.0, channels=CHANNELS, fft_size=4096, overlap=8)
+        encoders = []
+        for ext, output_file in exports:
+            partial = partial_output_path(output_file)
+            err = tempfile.TemporaryFile()
+            proc = subprocess.Popen(
+                [tool_path("ffmpeg"), "-y", "-v", "error"] + pcm_flags + ["-i", "-"] + quality_by_ext[ext] + [partial],
+                stdin=subprocess.PIPE, stderr=err)
+            encoders.append({"output_file": output_file, "partial": partial, "proc": proc, "err": err})
+        lanes.append({"shifter": shifter, "encoders": encoders, "queue": queue.Queue(maxsize=4),
+                      "out": np.empty((max_frames, CHANNELS), dtype=np.float32),
+                      "to_skip": shifter.latency, "shift_s": 0.0})
+
+    def process_lane_block(lane, raw):
+        usable = len(raw) - len(raw) % frame_bytes
+        block = np.frombuffer(raw[:usable], dtype=np.float32).reshape(-1, CHANNELS)
+        shift_start = time.perf_counter()
+        shifted = lane["shifter"].process(block, lane["out"][:len(block)])
+        lane["shift_s"] += time.perf_counter() - shift_start
+        skip = min(lane["to_skip"], len(shifted))
+        lane["to_skip"] -= skip
+        data = shifted[skip:].tobytes()
+        for encoder in lane["encoders"]:
+            try:
+                encoder["proc"].stdin.write(data)
+            except (BrokenPipeError, OSError):
+                pass  # fout komt via de returncode naar boven
+
+    def run_lane(lane):
+        # Eigen thread per target: de shifts van de targets lopen parallel
+        while True:
+            raw = lane["queue"].get()
+            if raw is None:
+                return
+            if "error" in lane:
+                continue  # blijven leeglezen, anders blokkeert de decoder
+            try:
+                process_lane_block(lane, raw)
+            except Exception as e:
+                lane["error"] = e
+
+    threads = [threading.Thread(target=run_lane, args=(lane,), daemon=True) for lane in lanes]
+    for thread in threads:
+        thread.start()
+    frames_in = 0
+    try:
+        raw = ingest["head"]
+        while raw:
+            frames_in += len(raw) // frame_bytes
+            for lane in lanes:
+                lane["queue"].put(raw)  # zelfde (read-only) buffer voor alle targets
+            raw = decoder.stdout.read(STREAM_BLOCK_FRAMES * frame_bytes)
+        for lane in lanes:
+            # Staart van de shifter leegmaken
+            lane["queue"].put(bytes(lane["shifter"].latency * frame_bytes))
+    finally:
+        for lane in lanes:
+            lane["queue"].put(None)
+        for thread in threads:
+            thread.join()
+        decoder.stdout.close()
+        decoder.wait()
+        for lane in lanes:
+            for encoder in lane["encoders"]:
+                try:
+                    encoder["proc"].stdin.close()
+                except (BrokenPipeError, OSError):
+                    pass
+                encoder["proc"].wait()
+
+    stream_s = time.perf_counter() - start
+    decode_ok = decoder.returncode == 0
+    if not decode_ok:
+        ingest["err"].seek(0)
+        print("\n❌ Error during streaming decode:")
+        print(ingest["err"].read().decode("utf-8", errors="replace"))
+    outcome = {}
+    for lane in lanes:
+        for encoder in lane["encoders"]:
+            ok = decode_ok and encoder["proc"].returncode == 0 and "error" not in lane
+            if "error" in lane:
+                print(f"\n❌ Error during pitch shift for {encoder['output_file']}: {lane['error']}")
+            if ok:
+                publish_output(encoder["partial"], encoder["output_file"])
+                print("Done! Converted file saved as:", encoder["output_file"])
+            else:
+                if encoder["proc"].returncode != 0:
+                    encoder["err"].seek(0)
+                    print(f"\n❌ Error during streaming encode of {encoder['output_file']}:")
+                    print(encoder["err"].read().decode("utf-8", errors="replace"))
+                if os.path.exists(encoder["partial"]):
+                    os.remove(encoder["partial"])
+            encoder["err"].close()
+            outcome[encoder["output_file"]] = (ok, {"stream_s": stream_s, "shift_s": lane["shift_s"],
+                                                    "audio_frames": frames_in})
+    return outcome
+
+def convert_fanout(input_file, plan, quality_by_ext, ingest):
+    """
+    Produce every output in `plan` ({target_hz: [(output_ext, output_file), ...]})
+    from one ingest: one pitch shift per target (targets in parallel) and
+    one encode per format from the shared shifted audio. Returns
+    {output_file: (ok, stats)}.
+    """
+    if "decoder" in ingest:
+        return convert_fanout_streaming(input_file, plan, quality_by_ext, ingest)
+    outcome = {}
+    with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+        futures = [pool.submit(fanout_target, input_file, ingest["wav"], ingest["scratch"], target_hz, exports,
+                               quality_by_ext)
+                   for target_hz, exports in plan.items()]
+    for future in futures:
+        outcome.update(future.result())
+    for ok, stats in outcome.values():
+        stats["audio_frames"] = ingest["frames"]
+    return outcome
+
+#   Batch - 1 bestand
+def process_batch_file(file_path, target_hz, output_folder, output_ext, quality_flags=None, near_target="ask",
+                       overwrite=True, output_file=None):
+    """
+    Validate, analyse and convert one batch file.
+
+    near_target decides what happens when the file is already close to the
+    target tuning (see near_target_action): "ask" (prompt), "copy", "skip" or
+    "convert". In the WAV pipeline a file whose opening already looks close
+    (likely_near_target) is analysed before the full decode, so copied and
+    skipped files are never decoded in full; otherwise the decision uses the
+    analysis of the ingest.
+    With overwrite=False an existing output file is left alone (status "exists").
+    output_file is the path from reserve_output_path; by default
+    {stem}_{hz}Hz{ext} in output_folder.
+
+    Returns a result dict (input_path, output_path, detected_hz, status, error,
+    stats). Status is one of: converted, cached, copied, exists, skipped,
+    invalid, failed.
+    stats holds the wall time per stage in seconds (hash_s, ingest_s,
+    analyse_s, the conversion stages and total_s), audio_frames and
+    temp_bytes written. Never raises, so one bad file cannot stop the rest
+    of the batch.
+    """
+    if quality_flags is None:
+        quality_flags = choose_quality(output_ext)
+
+    result = {
+        "input_path": file_path,
+        "output_path": None,
+        "detected_hz": None,
+        "status": "failed",
+        "error": None,
+        "stats": {"temp_bytes": 0},
+    }
+    stats = result["stats"]
+    ingest = None
+    total_start = time.perf_counter()
+    try:
+        if output_file is None:
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            output_file = os.path.join(output_folder, f"{name}_{target_hz}Hz{output_ext}")
+        if not overwrite and os.path.exists(output_file):
+            print(f"Output already exists, skipping: {output_file}")
+            result.update(output_path=output_file, status="exists")
+            return result
+
+        # Cache: zelfde input + zelfde instellingen = niets opnieuw doen
+        key = digest = None
+        if CACHE_ENABLED and os.path.exists(file_path):
+            start = time.perf_counter()
+            digest = file_digest(file_path)
+            stats["hash_s"] = time.perf_counter() - start
+            key = cache_key(digest, target_hz, output_ext, quality_flags)
+            hit = cache_lookup(key)
+            if hit:
+                partial = partial_output_path(output_file)
+                link_or_copy(hit[0], partial)
+                publish_output(partial, output_file)
+                print(f"♻️ Cache hit, reused earlier conversion: {output_file}")
+                result.update(output_path=output_file, detected_hz=hit[1], status="cached")
+                return result
+
+        def decide(detected_hz, confidence):
+            # Near-target beleid; True = klaar (gekopieerd of overgeslagen)
+            stats["shift_cents"] = target_shift_cents(detected_hz, target_hz)
+            result["detected_hz"] = detected_hz
+            print(f"Detected tuning reference: {detected_hz:.2f} Hz (confidence {confidence:.2f})")
+            action = near_target_action(detected_hz, confidence, target_hz, near_target)
+            if action == "skip":
+                print("Skipping this file.")
+                result["status"] = "skipped"
+            elif action == "copy":
+                copy_result(result, file_path, output_file, quality_flags)
+            return action != "convert"
+
+        # WAV pipeline: zit het begin al op de target, dan analyseren voor de volledige decode
+        detected_hz = None
+        if near_target != "convert" and not STREAMING_PIPELINE and os.path.exists(file_path):
+            start = time.perf_counter()
+            if likely_near_target(file_path, [target_hz]):
+                detected_hz, confidence = sample_tuning(file_path)
+                stats["analyse_s"] = time.perf_counter() - start
+                if decide(detected_hz, confidence):
+                    return result
+            else:
+                stats["analyse_s"] = time.perf_counter() - start
+
+        # 1 decode: validatie + analyse-venster + input voor de conversie
+        start = time.perf_counter()
+        ingest = ingest_audio(file_path)
+        stats["ingest_s"] = time.perf_counter() - start
+        if ingest is None:
+            print(f"Skipping invalid file: {file_path}")
+            result.update(status="invalid", detected_hz=None)
+            stats.pop("shift_cents", None)
+            return result
+        if ingest.get("wav"):
+            stats["temp_bytes"] += os.path.getsize(ingest["wav"])
+
+        # Streaming: de ingest heeft alleen het begin gelezen, kopie/overslaan kost dus geen volledige decode
+        if detected_hz is None:
+            start = time.perf_counter()
+            detected_hz, confidence = sample_tuning(file_path, ingest)
+            stats["analyse_s"] = stats.get("analyse_s", 0) + time.perf_counter() - start
+            if decide(detected_hz, confidence):
+                return result
+
+        if convert_audio_440_to_target(file_path, output_file, target_hz, quality_flags, ingest=ingest, stats=stats):
+            result["output_path"] = output_file
+            result["status"] = "converted"
+            if key:
+                cache_store(key, digest, target_hz, output_ext, quality_flags, output_file, detected_hz)
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        close_ingest(ingest)
+        stats["total_s"] = time.perf_counter() - total_start
+    return result
+
+#   --------------------
+#   Folder scanner
+#   --------------------
+def is_converted(input_path, target_hz, output_ext, stat=None):
+    """
+    True when converted_files has a successful conversion of this exact input:
+    same size and mtime (rows without input_mtime: converted after the last change).
+    """
+    try:
+        stat = stat or os.stat(input_path)
+    except OSError:
+        return False
+    with db_cursor() as cur:
+        return cur.execute("""
+        SELECT 1 FROM converted_files
+        WHERE input_path = ? AND target_hz = ? AND output_ext = ? AND status IN ('converted', 'cached', 'copied')
+              AND ((input_mtime = ? AND input_bytes = ?) OR (input_mtime IS NULL AND timestamp >= ?))
+        LIMIT 1
+        """, (input_path, float(target_hz), output_ext, stat.st_mtime, stat.st_size,
+              datetime.fromtimestamp(stat.st_mtime).isoformat())).fetchone() is not None
+
+def scan_audio_files(root, allowed_inputs=(".mp3", ".wav", ".flac"), recursive=True, exclude=()):
+    """
+    Lazily yield os.DirEntry objects for audio files under `root`.
+
+    Walks with os.scandir (depth first, sorted per folder) so work can start
+    on the first file while the rest of the tree is still unread; only one
+    folder listing is held in memory at a time. Folders in `exclude` (e.g.
+    the output folder) and partial outputs are skipped.
+    """
+    allowed_inputs = tuple(ext.lower() for ext in allowed_inputs)
+    exclude = {os.path.abspath(path) for path in exclude}
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"⚠️ Cannot read folder {folder}: {e}")
+            continue
+        subfolders = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and os.path.abspath(entry.path) not in exclude:
+                        subfolders.append(entry.path)
+                elif (entry.is_file() and entry.name.lower().endswith(allowed_inputs)
+                      and not entry.name.startswith(PARTIAL_PREFIX)):
+                    yield entry
+            except OSError:
+                continue
+        stack.extend(reversed(subfolders))
+
+def iter_files_to_convert(root, target_hz, output_ext, allowed_inputs=(".mp3", ".wav", ".flac"), recursive=True,
+                          exclude=(), skip_converted=True):
+    """Paths from scan_audio_files, minus files whose size and mtime match an earlier conversion."""
+    for entry in scan_audio_files(root, allowed_inputs, recursive, exclude):
+        # DirEntry.stat() is gecached (op Windows zelfs zonder extra system call)
+        if skip_converted and is_converted(entry.path, target_hz, output_ext, entry.stat()):
+            continue
+        yield entry.path
+
+def output_folder_for(input_path, output_folder, source_root=None):
+    """Output folder for one input: the source tree below `source_root` is mirrored into `output_folder`."""
+    if not source_root:
+        return output_folder
+    relative = os.path.relpath(os.path.dirname(os.path.abspath(input_path)), os.path.abspath(source_root))
+    if relative == os.curdir or relative.startswith(os.pardir):
+        return output_folder
+    return os.path.join(output_folder, relative)
+
+#   --------------------
+#   Batch jobs (hervatbaar)
+#   --------------------
+def file_state_for(status):
+    """Job file state for a process_batch_file status."""
+    return "failed" if status in ("invalid", "failed") else "done"
+
+def create_batch_job(target_hz, output_folder, output_ext, quality_flags, near_target, overwrite, source_root=None,
+                     input_formats=None):
+    """Store a new batch run (files are added with register_job_files); returns the job id."""
+    now = datetime.now().isoformat()
+    with db_cursor() as cur:
+        cur.execute("""
+        INSERT INTO batch_jobs (created, updated, status, target_hz, output_folder, output_ext, quality,
+                                near_target, overwrite, source_root, input_formats)
+        VALUES (?, ?, 'running', ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (now, now, target_hz, output_folder, output_ext, json.dumps(quality_flags), near_target,
+              int(overwrite), source_root, json.dumps(input_formats) if input_formats else None))
+        return cur.lastrowid
+
+def register_job_files(job_id, paths, start_idx=0):
+    """
+    Yield (idx, path) for `paths` (any iterable, also a lazy scan) after
+    adding them to the job as pending, DB_BATCH_SIZE files per transaction.
+    """
+    chunk = []
+
+    def store():
+        now = datetime.now().isoformat()
+        with db_cursor() as cur:
+            cur.executemany("""
+            INSERT INTO batch_job_files (job_id, idx, input_path, state, updated) VALUES (?, ?, ?, 'pending', ?)
+            """, [(job_id, idx, path, now) for idx, path in chunk])
+
+    for idx, path in enumerate(paths, start_idx):
+        chunk.append((idx, path))
+        if len(chunk) >= DB_BATCH_SIZE:
+            store()
+            yield from chunk
+            chunk = []
+    if chunk:
+        store()
+        yield from chunk
+
+def load_batch_job(job_id=None):
+    """
+    Load a job's settings and its unfinished files (state pending, running or failed).
+
+    Without job_id the most recent unfinished job is used. Returns None when
+    there is no such job.
+    """
+    columns = ("id, target_hz, output_folder, output_ext, quality, near_target, overwrite, source_root, "
+               "input_formats")
+    with db_cursor() as cur:
+        if job_id is None:
+            row = cur.execute(f"SELECT {columns} FROM batch_jobs WHERE status != 'done' ORDER BY id DESC LIMIT 1"
+                              ).fetchone()
+        else:
+            row = cur.execute(f"SELECT {columns} FROM batch_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        total, next_idx = cur.execute("""
+        SELECT COUNT(*), COALESCE(MAX(idx) + 1, 0) FROM batch_job_files WHERE job_id = ?
+        """, (row[0],)).fetchone()
+        files = cur.execute("""
+        SELECT idx, input_path, state FROM batch_job_files WHERE job_id = ? AND state != 'done' ORDER BY idx
+        """, (row[0],)).fetchall()
+        done_outputs = cur.execute("""
+        SELECT input_path, output_path FROM batch_job_files
+        WHERE job_id = ? AND state = 'done' AND output_path IS NOT NULL
+        """, (row[0],)).fetchall()
+    target_hz = int(row[1]) if float(row[1]).is_integer() else row[1]
+    return {
+        "id": row[0],
+        "target_hz": target_hz,
+        "output_folder": row[2],
+        "output_ext": row[3],
+        "quality_flags": json.loads(row[4]),
+        "near_target": row[5],
+        "overwrite": bool(row[6]),
+        "source_root": row[7],
+        "input_formats": json.loads(row[8]) if row[8] else None,
+        "files": files,
+        "done_outputs": done_outputs,
+        "total_files": total,
+        "next_idx": next_idx,
+    }
+
+def job_has_file(job_id, input_path):
+    with db_cursor() as cur:
+        return cur.execute("SELECT 1 FROM batch_job_files WHERE job_id = ? AND input_path = ? LIMIT 1",
+                           (job_id, input_path)).fetchone() is not None
+
+def list_batch_jobs(limit=20):
+    """Recent jobs with their number of files per state."""
+    with db_cursor() as cur:
+        return cur.execute("""
+        SELECT j.id, j.created, j.status, j.target_hz, j.output_folder, COUNT(f.idx),
+               SUM(f.state = 'pending'), SUM(f.state = 'running'), SUM(f.state = 'done'), SUM(f.state = 'failed')
+        FROM batch_jobs j LEFT JOIN batch_job_files f ON f.job_id = j.id
+        GROUP BY j.id ORDER BY j.id DESC LIMIT ?
+        """, (limit,)).fetchall()
+
+def mark_file_running(job_id, idx):
+    with db_cursor() as cur:
+        cur.execute("UPDATE batch_job_files SET state = 'running', updated = ? WHERE job_id = ? AND idx = ?",
+                    (datetime.now().isoformat(), job_id, idx))
+
+def cleanup_stale_files(job):
+    """
+    Remove partial outputs an interrupted run left behind for files that
+    were running (its temp WAVs go with its scratch root, see
+    cleanup_stale_scratch). Call it with the outputs of the job's done
+    files reserved (see resume_batch_job). Returns the number removed.
+    """
+    removed = 0
+    for idx, input_path, state in job["files"]:
+        if state != "running":
+            continue
+        folder = output_folder_for(input_path, job["output_folder"], job["source_root"])
+        output_file = reserve_output_path(input_path, folder, job["target_hz"], job["output_ext"])
+        release_output_paths([output_file])
+        for partial in stale_partials(output_file):
+            try:
+                os.remove(partial)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+def resume_batch_job(job_id=None, workers=1, retry_failed=False):
+    """
+    Continue an interrupted batch job where it stopped. Files that were
+    running are cleaned up and converted again; done files are left alone,
+    failed files only with retry_failed. A job started from a folder scan
+    also rescans its source tree for files the interrupted scan never
+    reached. Returns the result dicts of the files processed now, or None
+    when there is nothing to resume.
+    """
+    job = load_batch_job(job_id)
+    if job is None:
+        print("No unfinished batch job found.")
+        return None
+    if not check_tools([job["output_ext"]]):
+        return None
+    # Outputs van afgemaakte bestanden vasthouden, anders kan een bestand met dezelfde naam ze overschrijven
+    kept = keep_output_paths(job["done_outputs"])
+    try:
+        removed = cleanup_stale_files(job)
+        if removed:
+            print(f"Removed {removed} partial outputs from the interrupted run.")
+
+        todo_states = ("pending", "running", "failed") if retry_failed else ("pending", "running")
+        entries = [(idx, path) for idx, path, state in job["files"] if state in todo_states]
+        print(f"Resuming job {job['id']}: {len(entries)} of {job['total_files']} registered files left.")
+        if job["source_root"]:
+            rescan = (path for path in iter_files_to_convert(job["source_root"], job["target_hz"],
+                                                             job["output_ext"], job["input_formats"],
+                                                             exclude=[job["output_folder"]])
+                      if not job_has_file(job["id"], path))
+            entries = chain(entries, register_job_files(job["id"], rescan, job["next_idx"]))
+        return run_batch_job(job["id"], entries, job["target_hz"], job["output_folder"], job["output_ext"],
+                             workers, job["quality_flags"], job["near_target"], job["overwrite"],
+                             job["source_root"])
+    finally:
+        release_output_paths(kept)
+
+#   Fan-out - 1 bestand, meerdere targets en formaten
+def process_fanout_file(file_path, targets, output_exts, output_folder, quality_by_ext, near_target="copy",
+                        overwrite=True, output_files=None):
+    """
+    Decode and analyse one file once and produce every target Hz x format.
+
+    Returns one process_batch_file-style result dict per output, each with
+    its own "target_hz". Stages shared by several outputs (hash, ingest,
+    analyse, and the shift shared by the formats of one target) are divided
+    over those outputs, so summed stage times stay correct. Targets the
+    file is already near are handled as in process_batch_file: copied or
+    skipped before the full decode when its opening looks close.
+    output_files maps (target_hz, output_ext) to the path from
+    reserve_output_path; by default {stem}_{hz}Hz{ext} in output_folder.
+    Never raises.
+    """
+    results = {}
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    for target_hz in targets:
+        for output_ext in output_exts:
+            if output_files:
+                output_file = output_files[target_hz, output_ext]
+            else:
+                output_file = os.path.join(output_folder, f"{name}_{target_hz}Hz{output_ext}")
+            results[output_file] = {
+                "input_path": file_path,
+                "output_path": None,
+                "target_hz": target_hz,
+                "output_ext": output_ext,
+                "detected_hz": None,
+                "status": "failed",
+                "error": None,
+                "stats": {"temp_bytes": 0},
+            }
+    shared = {}
+    ingest = None
+    total_start = time.perf_counter()
+    try:
+        todo = {}
+        for output_file, result in results.items():
+            if not overwrite and os.path.exists(output_file):
+                result.update(output_path=output_file, status="exists")
+            else:
+                todo[output_file] = result
+
+        # Cache per output: 1 hash voor alle combinaties
+        keys = {}
+        if CACHE_ENABLED and todo and os.path.exists(file_path):
+            start = time.perf_counter()
+            digest = file_digest(file_path)
+            shared["hash_s"] = time.perf_counter() - start
+            for output_file, result in list(todo.items()):
+                key = cache_key(digest, result["target_hz"], result["output_ext"],
+                                quality_by_ext[result["output_ext"]])
+                hit = cache_lookup(key)
+                if hit:
+                    partial = partial_output_path(output_file)
+                    link_or_copy(hit[0], partial)
+                    publish_output(partial, output_file)
+                    result.update(output_path=output_file, detected_hz=hit[1], status="cached")
+                    del todo[output_file]
+                else:
+                    keys[output_file] = (key, digest)
+        if not todo:
+            return list(results.values())
+
+        def decide(detected_hz, confidence):
+            # Near-target beleid per target: gekopieerde/overgeslagen targets vallen uit het plan
+            print(f"Detected tuning reference: {detected_hz:.2f} Hz (confidence {confidence:.2f})")
+            for target_hz in dict.fromkeys(result["target_hz"] for result in todo.values()):
+                action = near_target_action(detected_hz, confidence, target_hz, near_target)
+                if action == "convert":
+                    continue
+                for output_file, result in list(todo.items()):
+                    if result["target_hz"] != target_hz:
+                        continue
+                    result["detected_hz"] = detected_hz
+                    result["stats"]["shift_cents"] = target_shift_cents(detected_hz, target_hz)
+                    if action == "copy":
+                        copy_result(result, file_path, output_file, quality_by_ext[result["output_ext"]])
+                    else:
+                        result["status"] = "skipped"
+                    del todo[output_file]
+
+        # WAV pipeline: zit het begin al op een target, dan analyseren voor de volledige decode
+        detected_hz = None
+        if near_target != "convert" and not STREAMING_PIPELINE and os.path.exists(file_path):
+            start = time.perf_counter()
+            if likely_near_target(file_path, list(dict.fromkeys(r["target_hz"] for r in todo.values()))):
+                detected_hz, confidence = sample_tuning(file_path)
+                decide(detected_hz, confidence)
+            shared["analyse_s"] = time.perf_counter() - start
+            if not todo:
+                return list(results.values())
+
+        # 1 decode voor de overige targets (scratch: gedecodeerd + 1 verschoven WAV per target)
+        todo_targets = {result["target_hz"] for result in todo.values()}
+        start = time.perf_counter()
+        ingest = ingest_audio(file_path, scratch_copies=1 + len(todo_targets))
+        shared["ingest_s"] = time.perf_counter() - start
+        if ingest is None:
+            for result in todo.values():
+                result["status"] = "invalid"
+            return list(results.values())
+
+        # Streaming: de ingest heeft alleen het begin gelezen, kopie/overslaan kost dus geen volledige decode
+        if detected_hz is None:
+            start = time.perf_counter()
+            detected_hz, confidence = sample_tuning(file_path, ingest)
+            shared["analyse_s"] = shared.get("analyse_s", 0) + time.perf_counter() - start
+            decide(detected_hz, confidence)
+            if not todo:
+                return list(results.values())
+
+        plan = {}
+        for output_file, result in todo.items():
+            result["detected_hz"] = detected_hz
+            result["stats"]["shift_cents"] = target_shift_cents(detected_hz, result["target_hz"])
+            plan.setdefault(result["target_hz"], []).append((result["output_ext"], output_file))
+
+        for output_file, (ok, stats) in convert_fanout(file_path, plan, quality_by_ext, ingest).items():
+            result = results[output_file]
+            # Gedeelde shift (alle formaten van 1 target) en stream verdelen
+            formats = len(plan[result["target_hz"]])
+            for stage in ("shift_s", "stream_s"):
+                if stage in stats:
+                    stats[stage] /= formats
+            result["stats"].update(stats)
+            if ok:
+                result.update(output_path=output_file, status="converted")
+                if output_file in keys:
+                    key, digest = keys[output_file]
+                    cache_store(key, digest, result["target_hz"], result["output_ext"],
+                                quality_by_ext[result["output_ext"]], output_file, detected_hz)
+    except Exception as e:
+        for result in results.values():
+            if result["status"] == "failed":
+                result["error"] = str(e)
+    finally:
+        close_ingest(ingest)
+        # Gedeelde stappen gelijk over alle outputs verdelen
+        shared["total_s"] = time.perf_counter() - total_start
+        for result in results.values():
+            for stage, value in shared.items():
+                result["stats"][stage] = value / len(results)
+    return list(results.values())
 
 #   Batch converting
-def batch_convert_files(file_list, target_hz, output_folder, output_ext):
+def batch_convert_files(file_list, target_hz, output_folder, output_ext, workers=1, quality_flags=None,
+                        near_target=None, overwrite=True, source_root=None, input_formats=None):
     """
     Convert multiple audio files to the target tuning. With progress display.
 
+    The run is stored as a batch job, so an interrupted batch can be
+    continued with resume_batch_job.
+
     Parameters:
-         file_list: list of file paths
+         file_list: file paths; may be a lazy iterator (e.g. iter_files_to_convert),
+                    conversion starts with the first file
          target_hz: desired target frequency in Hz
          output_folder: folder where converted files will be saved
+         output_ext: output extension (.mp3, .wav, .flac)
+         workers: number of files converted at the same time (1 = sequential);
+                  with the streaming pipeline the pitch shift shares one core
+         quality_flags: ffmpeg quality flags, asked once per batch if None
+         near_target: "ask", "copy", "skip" or "convert" for files already near
+                      the target; default "ask" sequentially, "copy" in parallel
+         overwrite: False keeps existing output files (status "exists")
+         source_root: mirror the folder tree below this folder into output_folder;
+                      a resume also rescans it (with input_formats)
+
+    Returns the list of result dicts in input order.
+    """
+    if not check_tools([output_ext]):
+        return []
+    # Kwaliteit 1x per batch kiezen i.p.v. per bestand
+    if quality_flags is None:
+        quality_flags = choose_quality(output_ext)
+
+    workers = max(1, int(workers))
+    if near_target is None:
+        near_target = "ask" if workers == 1 else "copy"
+
+    job_id = create_batch_job(target_hz, output_folder, output_ext, quality_flags, near_target, overwrite,
+                              source_root, input_formats)
+    total_files = len(file_list) if isinstance(file_list, (list, tuple)) else None
+    print(f"Batch job {job_id} created.")
+    return run_batch_job(job_id, register_job_files(job_id, file_list), target_hz, output_folder, output_ext,
+                         workers, quality_flags, near_target, overwrite, source_root, total_files)
+
+def run_batch_job(job_id, entries, target_hz, output_folder, output_ext, workers, quality_flags, near_target,
+                  overwrite, source_root=None, total_files=None):
+    """
+    Process (idx, path) entries of a batch job; returns the result dicts in entry order.
+
+    `entries` may be lazy: files are handed to the workers as they come in,
+    with at most 2 x workers submitted at a time. total_files is only used
+    for the progress display.
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    total_files = len(file_list)
-    for idx, file_path in enumerate(file_list, 1):
-        print(f"\nProcessing {idx}/{total_files}: {file_path}")
+    workers = max(1, int(workers))
+    if near_target == "ask" and workers > 1:
+        # Geen prompts vanuit worker threads
+        near_target = "copy"
+    if total_files is None and isinstance(entries, list):
+        total_files = len(entries)
+    total = "" if total_files is None else f"/{total_files}"
+    results = []
+
+    pending_rows = []
+    pending_states = []
+
+    def flush():
+        # History rijen en job states in dezelfde transactie
+        if not pending_states:
+            return
+        with db_cursor() as cur:
+            insert_conversions(cur, pending_rows)
+            cur.executemany("""
+            UPDATE batch_job_files SET state = ?, status = ?, output_path = ?, error = ?, updated = ?
+            WHERE job_id = ? AND idx = ?
+            """, pending_states)
+        pending_rows.clear()
+        pending_states.clear()
+
+    def record(pos, idx, result):
+        # DB writes only happen on the calling thread, DB_BATCH_SIZE files per transaction
+        results[pos] = result
+        row = result_row(result, target_hz)
+        if row:
+            pending_rows.append(row)
+        pending_states.append((file_state_for(result["status"]), result["status"], result["output_path"],
+                               result["error"], datetime.now().isoformat(), job_id, idx))
+        if len(pending_states) >= DB_BATCH_SIZE:
+            flush()
+
+    reserved = []
+
+    def reserve(file_path):
+        # Op de aanroepende thread, in input volgorde: zelfde namen bij elke run
+        folder = output_folder_for(file_path, output_folder, source_root)
+        output_file = reserve_output_path(file_path, folder, target_hz, output_ext)
+        reserved.append(output_file)
+        return output_file
+
+    def run_one(idx, file_path, output_file):
+        mark_file_running(job_id, idx)
+        folder = os.path.dirname(output_file)
+        os.makedirs(folder, exist_ok=True)
+        return process_batch_file(file_path, target_hz, folder, output_ext, quality_flags, near_target, overwrite,
+                                  output_file)
 
-        if not validate_audio_file(file_path):
-            print(f"Skipping invalid file: {file_path}")
-            continue
+    try:
+        if workers == 1:
+            for pos, (idx, file_path) in enumerate(entries):
+                print(f"\nProcessing {pos + 1}{total}: {file_path}")
+                results.append(None)
+                record(pos, idx, run_one(idx, file_path, reserve(file_path)))
+        else:
+            print(f"Running batch with {workers} parallel workers...")
+            # Threads: ffmpeg/rubberband run as subprocesses and overlapping vocoder shifts go to
+            # dsp_pool. The streaming pipeline shifts in these threads under the GIL, so there
+            # workers > 1 mostly overlaps decoding and encoding.
+            pool = ThreadPoolExecutor(max_workers=workers)
+            futures = {}
+            done_count = 0
+
+            def collect(finished):
+                nonlocal done_count
+                for future in finished:
+                    pos, idx = futures.pop(future)
+                    result = future.result()
+                    record(pos, idx, result)
+                    done_count += 1
+                    print(f"\n[{done_count}{total}] {result['status']}: {result['input_path']}")
 
-        sample_wav = extract_sample(file_path)
-        detected_hz = estimate_tuning(sample_wav)
-        if os.path.exists(sample_wav):
-            os.remove(sample_wav)
+            try:
+                for pos, (idx, file_path) in enumerate(entries):
+                    results.append(None)
+                    futures[pool.submit(run_one, idx, file_path, reserve(file_path))] = (pos, idx)
+                    if len(futures) >= 2 * workers:
+                        collect(wait(futures, return_when=FIRST_COMPLETED).done)
+                for future in as_completed(list(futures)):
+                    collect([future])
+            finally:
+                # Bij Ctrl-C niet nog alle wachtende bestanden afmaken
+                pool.shutdown(wait=True, cancel_futures=True)
+                # Wat tijdens de shutdown nog klaar kwam ook vastleggen, anders blijft het "running" en wordt het bij resume opnieuw geconverteerd
+                collect([future for future in list(futures) if not future.cancelled() and future.exception() is None])
+    finally:
+        # Ook bij een afgebroken batch de al geconverteerde bestanden vastleggen
+        flush()
+        release_output_paths(reserved)
 
-        print(f"Detected approximate tuning: {detected_hz:.2f} Hz")
+    with db_cursor() as cur:
+        cur.execute("UPDATE batch_jobs SET status = 'done', updated = ? WHERE id = ?",
+                    (datetime.now().isoformat(), job_id))
 
-        if abs(detected_hz - target_hz) < 1.0:
-            print(f"⚠️ File is already close to target ({detected_hz:.2f} Hz ~ {target_hz} Hz).")
-            proceed = input("Do you still want to convert? (y/n): ").strip().lower()
-            if proceed != "y":
-                print("Skipping this file.")
-                continue
+    if CACHE_ENABLED:
+        evicted = cache_evict()
+        if evicted:
+            print(f"Cache: removed {evicted} old cached outputs (limit {CACHE_MAX_BYTES / 1024 ** 3:.1f} GB).")
 
-        name, ext = os.path.splitext(os.path.basename(file_path))
-        output_file = os.path.join(output_folder, f"{name}_{target_hz}Hz{output_ext}")
+    print_batch_summary(results)
+    return results
 
-        convert_audio_440_to_target(file_path, output_file, target_hz)
+#   Fan-out batch
+def batch_fanout_files(file_list, targets, output_exts, output_folder, workers=1, quality="high",
+                       near_target="copy", overwrite=True, source_root=None):
+    """
+    Convert every file to every target Hz x output format, decoding and
+    analysing each input only once (see process_fanout_file). Each output
+    is recorded in converted_files. `file_list` may be lazy, like in
+    batch_convert_files. Returns all per-output result dicts.
+    """
+    if not check_tools(output_exts):
+        return []
+    quality_by_ext = {ext: quality_flags_for(ext, quality) for ext in output_exts}
+    workers = max(1, int(workers))
+    results = []
+    rows = []
+
+    def record(file_results):
+        results.extend(file_results)
+        for result in file_results:
+            row = result_row(result)
+            if row:
+                rows.append(row)
+            print(f"[{result['status']}] {result['input_path']} -> {result['target_hz']} Hz {result['output_ext']}")
+        if len(rows) >= DB_BATCH_SIZE:
+            save_conversions_to_db(rows)
+            rows.clear()
+
+    reserved = []
+
+    def reserve(file_path):
+        # Op de aanroepende thread, in input volgorde: zelfde namen bij elke run
+        folder = output_folder_for(file_path, output_folder, source_root)
+        output_files = {(target_hz, ext): reserve_output_path(file_path, folder, target_hz, ext)
+                        for target_hz in targets for ext in output_exts}
+        reserved.extend(output_files.values())
+        return folder, output_files
+
+    def run_one(file_path, folder, output_files):
+        os.makedirs(folder, exist_ok=True)
+        return process_fanout_file(file_path, targets, output_exts, folder, quality_by_ext, near_target, overwrite,
+                                   output_files)
+
+    print(f"Fan-out: {len(targets)} target(s) x {len(output_exts)} format(s) per file, {workers} worker(s).")
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = set()
+    try:
+        for file_path in file_list:
+            futures.add(pool.submit(run_one, file_path, *reserve(file_path)))
+            if len(futures) >= 2 * workers:
+                finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result())
+        for future in as_completed(futures):
+            record(future.result())
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        save_conversions_to_db(rows)
+        release_output_paths(reserved)
+
+    if CACHE_ENABLED:
+        cache_evict()
+    print_batch_summary(results)
+    return results
+
+#   Batch samenvatting
+def print_batch_summary(results):
+    """Print counts per status and the failed files, in input order."""
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+    print(f"\n✅ Batch conversion complete ({len(results)} files processed).")
+    for status in ("converted", "cached", "copied", "exists", "skipped", "invalid", "failed"):
+        print(f"   {status:<10} {counts.get(status, 0)}")
+
+    for result in results:
+        if result["status"] in ("invalid", "failed"):
+            reason = f" ({result['error']})" if result["error"] else ""
+            print(f"   ❌ {result['input_path']}{reason}")
 
-        save_conversion_to_db(
-            input_path=file_path,
-            output_path=output_file,
-            detected_hz=detected_hz,
-            target_hz=target_hz,
-        )
+#   --------------------
+#   Watch folder
+#   --------------------
+class InotifyWatcher:
+    """Linux inotify on one folder (via libc, no extra packages). poll() returns changed paths."""
+
+    MASK = 0x2 | 0x8 | 0x80 | 0x100  # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, folder):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.folder = folder
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {folder}")
+
+    def poll(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        pos = 0
+        while pos < len(data):
+            _, _, _, length = self._EVENT.unpack_from(data, pos)
+            pos += self._EVENT.size
+            name = data[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if name:
+                changed.add(os.path.join(self.folder, os.fsdecode(name)))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Fallback watcher: rescans the folder and reports files whose size or mtime changed."""
+
+    def __init__(self, folder, interval=None):
+        self.folder = folder
+        self.interval = interval or WATCH_POLL_SECONDS
+        self._seen = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        st = entry.stat()
+                        snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            pass
+        return snapshot
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self._snapshot()
+        changed = {path for path, sig in current.items() if self._seen.get(path) != sig}
+        self._seen = current
+        return changed
+
+    def close(self):
+        pass
+
+def make_watcher(folder, polling=False):
+    """inotify where available, otherwise (or with polling=True) the polling watcher."""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify not available ({e}), falling back to polling.")
+    return PollingWatcher(folder)
+
+def watch_folder(folder, target_hz, output_folder, output_ext, quality_flags, workers=1,
+                 allowed_inputs=(".mp3", ".wav", ".flac"), debounce=None, polling=False, stop_event=None):
+    """
+    Convert audio files that appear in (or change in) `folder` until Ctrl-C or `stop_event` is set.
 
-    print(f"\n✅ Batch conversion complete ({total_files} files processed).")
+    Files already in the folder are handled first. A file is only queued
+    once its size has not changed for `debounce` seconds (no half-copied
+    files) and when converted_files has no conversion newer than it. At
+    most `workers` files are converted at the same time; history rows are
+    written from this thread, one transaction per loop round.
+    """
+    if not check_tools([output_ext]):
+        return
+    debounce = WATCH_DEBOUNCE_SECONDS if debounce is None else debounce
+    allowed_inputs = tuple(ext.lower() for ext in allowed_inputs)
+    output_root = os.path.abspath(output_folder)
+    os.makedirs(output_folder, exist_ok=True)
+
+    def wanted(path):
+        name = os.path.basename(path)
+        return (name.lower().endswith(allowed_inputs) and not name.startswith(PARTIAL_PREFIX)
+                and not os.path.abspath(path).startswith(output_root + os.sep))
+
+    watcher = make_watcher(folder, polling)
+    print(f"👀 Watching {folder} ({type(watcher).__name__}), output to {output_folder}. Ctrl-C to stop.")
+    pending = {path: (0.0, None) for path in expand_inputs([folder], allowed_inputs)}  # pad -> (deadline, size)
+    running = {}  # future -> pad
+    outputs = {}  # future -> gereserveerde output
+    rows = []
+    pool = ThreadPoolExecutor(max_workers=max(1, int(workers)))
+    try:
+        while stop_event is None or not stop_event.is_set():
+            now = time.monotonic()
+            for path in watcher.poll(0.5 if pending or running else WATCH_POLL_SECONDS):
+                if wanted(path):
+                    pending[path] = (now + debounce, None)
+
+            # Debounce: pas converteren als de grootte een ronde stabiel is gebleven
+            for path, (deadline, size) in list(pending.items()):
+                if len(running) >= workers:
+                    break
+                if deadline > now or path in running.values():
+                    continue
+                try:
+                    current = os.path.getsize(path)
+                except OSError:
+                    del pending[path]  # weer verdwenen
+                    continue
+                if size != current and debounce > 0:
+                    pending[path] = (now + debounce, current)
+                    continue
+                del pending[path]
+                if is_converted(path, target_hz, output_ext):
+                    continue
+                output_file = reserve_output_path(path, output_folder, target_hz, output_ext)
+                future = pool.submit(process_batch_file, path, target_hz, output_folder, output_ext,
+                                     quality_flags, "copy", True, output_file)
+                running[future] = path
+                outputs[future] = output_file
+
+            for future in [f for f in running if f.done()]:
+                del running[future]
+                release_output_paths([outputs.pop(future)])
+                result = future.result()
+                print(f"[watch] {result['status']}: {result['input_path']}")
+                row = result_row(result, target_hz)
+                if row:
+                    rows.append(row)
+            save_conversions_to_db(rows)
+            rows.clear()
+    except KeyboardInterrupt:
+        print("\nStopping watch mode...")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future, path in running.items():
+            if not future.cancelled() and future.exception() is None:
+                result = future.result()
+                row = result_row(result, target_hz)
+                if row:
+                    rows.append(row)
+        save_conversions_to_db(rows)
+        release_output_paths(outputs.values())
+        watcher.close()
+
+# -------------------------
+#   Library API / CLI
+# -------------------------
+
+#   Input bestanden verzamelen
+def expand_inputs(inputs, allowed_inputs=(".mp3", ".wav", ".flac")):
+    """Expand files, folders and glob patterns into a sorted list of audio files."""
+    allowed_inputs = tuple(ext.lower() for ext in allowed_inputs)
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = [os.path.join(item, f) for f in os.listdir(item)]
+        elif glob.has_magic(item):
+            paths = glob.glob(item, recursive=True)
+        else:
+            paths = [item]
+        for path in paths:
+            if os.path.isfile(path) and path.lower().endswith(allowed_inputs):
+                found.add(path)
+    return sorted(found)
+
+def iter_inputs(inputs, target_hz, output_ext, allowed_inputs=(".mp3", ".wav", ".flac"), exclude=(),
+                skip_converted=True):
+    """
+    Lazy version of expand_inputs for big libraries: folders are scanned
+    recursively with iter_files_to_convert (unchanged, already converted
+    files skipped); files and glob patterns are expanded as usual.
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            yield from iter_files_to_convert(item, target_hz, output_ext, allowed_inputs, exclude=exclude,
+                                             skip_converted=skip_converted)
+        else:
+            yield from expand_inputs([item], allowed_inputs)
+
+def convert_files(inputs, target_hz, output_ext=".mp3", output_folder=None, quality="high",
+                  overwrite=False, near_target="copy", workers=None, allowed_inputs=(".mp3", ".wav", ".flac"),
+                  recursive=False):
+    """
+    Convert files without any prompts. Returns the batch result dicts.
+
+    Parameters:
+         inputs: files, folders and/or glob patterns
+         target_hz: desired target frequency in Hz, or a list of them
+         output_ext: .mp3, .wav or .flac, or a list of them. With more than
+                     one target or format every file is decoded and
+                     analysed once and fanned out (batch_fanout_files)
+         output_folder: default Converted_{target_hz}Hz_{date}
+         quality: low, medium or high
+         overwrite: False skips files whose output already exists
+         near_target: "copy" (unchanged, without re-encoding when the
+                      container stays the same), "skip" or "convert" for
+                      files already near the target
+         workers: parallel workers (default DEFAULT_WORKERS)
+         recursive: scan folders recursively and lazily, mirror their tree
+                    into output_folder and skip files converted before
+                    (same size and mtime) unless overwrite is set
+    """
+    if near_target not in ("copy", "skip", "convert"):
+        raise ValueError("near_target must be 'copy', 'skip' or 'convert'")
+    targets = list(target_hz) if isinstance(target_hz, (list, tuple)) else [target_hz]
+    output_exts = list(output_ext) if isinstance(output_ext, (list, tuple)) else [output_ext]
+    fanout = len(targets) > 1 or len(output_exts) > 1
+    target_hz, output_ext = targets[0], output_exts[0]
+    init_database()
+    if output_folder is None:
+        label = "_".join(str(t) for t in targets)
+        output_folder = f"Converted_{label}Hz_{datetime.now().strftime('%Y-%m-%d')}"
+
+    source_root = None
+    if recursive:
+        # Absolute paden, zodat een latere scan (of resume) dezelfde input_path's ziet
+        inputs = [os.path.abspath(item) if os.path.isdir(item) else item for item in inputs]
+        folders = [item for item in inputs if os.path.isdir(item)]
+        source_root = os.path.commonpath(folders) if folders else None
+        # DB skip kijkt naar 1 target/formaat; bij fan-out slaat overwrite=False bestaande outputs over
+        files = iter_inputs(inputs, target_hz, output_ext, allowed_inputs, exclude=[output_folder],
+                            skip_converted=not overwrite and not fanout)
+        first = next(files, None)
+        if first is None:
+            print("No audio files to convert.")
+            return []
+        file_list = chain([first], files)
+        print("Scanning and converting...")
+    else:
+        file_list = expand_inputs(inputs, allowed_inputs)
+        if not file_list:
+            print("No audio files found.")
+            return []
+        print(f"Found {len(file_list)} files. Starting batch conversion...")
+    if fanout:
+        return batch_fanout_files(file_list, targets, output_exts, output_folder,
+                                  workers=workers or DEFAULT_WORKERS, quality=quality,
+                                  near_target=near_target, overwrite=overwrite, source_root=source_root)
+    return batch_convert_files(
+        file_list, target_hz, output_folder, output_ext,
+        workers=workers or DEFAULT_WORKERS,
+        quality_flags=quality_flags_for(output_ext, quality),
+        near_target=near_target,
+        overwrite=overwrite,
+        source_root=source_root,
+        input_formats=list(allowed_inputs),
+    )
+
+def print_batch_jobs(jobs):
+    """Print list_batch_jobs() rows."""
+    print(f"{'job':>5} {'created':<19} {'status':<8} {'Hz':>7} {'files':>6} {'pending':>7} {'running':>7} "
+          f"{'done':>6} {'failed':>6}  output")
+    for job_id, created, status, hz, folder, files, pending, running, done, failed in jobs:
+        print(f"{job_id:>5} {created[:19]:<19} {status:<8} {hz:>7g} {files:>6} {pending or 0:>7} "
+              f"{running or 0:>7} {done or 0:>6} {failed or 0:>6}  {folder}")
+
+def resume_cli(argv):
+    """`resume` command: continue an interrupted batch job; returns the exit code."""
+    parser = argparse.ArgumentParser(prog="resume", description="Continue an interrupted batch job.")
+    parser.add_argument("job_id", nargs="?", type=int, help="job to resume (default: latest unfinished)")
+    parser.add_argument("--retry-failed", action="store_true", help="also convert files that failed before")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--list", action="store_true", help="only list recent jobs")
+    args = parser.parse_args(argv)
+
+    init_database()
+    if args.list:
+        print_batch_jobs(list_batch_jobs())
+        return 0
+    results = resume_batch_job(args.job_id, workers=args.workers, retry_failed=args.retry_failed)
+    if results is None:
+        return 1
+    return 1 if any(r["status"] in ("invalid", "failed") for r in results) else 0
+
+def watch_cli(argv):
+    """`watch` command: keep converting new files in a folder; returns the exit code."""
+    parser = argparse.ArgumentParser(prog="watch", description="Convert new audio files as they appear in a folder.")
+    parser.add_argument("folder", help="folder to watch")
+    parser.add_argument("-t", "--target-hz", type=float, required=True, help="target tuning, e.g. 432 or 528")
+    parser.add_argument("-f", "--format", choices=["mp3", "wav", "flac"], default="mp3", help="output format")
+    parser.add_argument("-q", "--quality", choices=["low", "medium", "high"], default="high")
+    parser.add_argument("-o", "--output", help="output folder (default <folder>/Converted_<Hz>Hz)")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--input-formats", default="mp3,wav,flac", help="comma separated input extensions")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECONDS,
+                        help="seconds a file must stay unchanged before it is converted")
+    parser.add_argument("--poll", action="store_true", help="use polling instead of inotify")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"not a folder: {args.folder}")
+    target_hz = int(args.target_hz) if args.target_hz.is_integer() else args.target_hz
+    output_ext = "." + args.format
+    allowed_inputs = tuple("." + ext.strip().lstrip(".") for ext in args.input_formats.split(",") if ext.strip())
+    init_database()
+    watch_folder(args.folder, target_hz, args.output or os.path.join(args.folder, f"Converted_{target_hz}Hz"),
+                 output_ext, quality_flags_for(output_ext, args.quality), workers=args.workers,
+                 allowed_inputs=allowed_inputs, debounce=args.debounce, polling=args.poll)
+    return 0
+
+def main_cli(argv=None):
+    """
+    Command line entry point; returns the process exit code. `stats`,
+    `resume` or `watch` as first argument runs stats_cli / resume_cli /
+    watch_cli; `tools` shows the external tools that were found.
+    """
+    global STREAMING_PIPELINE, CACHE_ENABLED, SCRATCH_DIR, PITCH_BACKEND, VOCODER_PRESET
+
+    exit_on_sigterm()
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "stats":
+        return stats_cli(argv[1:])
+    if argv and argv[0] == "resume":
+        return resume_cli(argv[1:])
+    if argv and argv[0] == "watch":
+        return watch_cli(argv[1:])
+    if argv and argv[0] == "tools":
+        print_tools()
+        return 0 if check_tools(list(ENCODER_PREFERENCES)) else 1
+
+    parser = argparse.ArgumentParser(
+        description="Convert audio from 440 Hz tuning to a target tuning without prompts.")
+    parser.add_argument("inputs", nargs="+", help="audio files, folders or glob patterns")
+    parser.add_argument("-t", "--target-hz", type=float, nargs="+", required=True,
+                        help="target tuning(s), e.g. 432 or 432 528")
+    parser.add_argument("-f", "--format", choices=["mp3", "wav", "flac"], nargs="+", default=["mp3"],
+                        help="output format(s); several targets/formats decode each file once")
+    parser.add_argument("-q", "--quality", choices=["low", "medium", "high"], default="high")
+    parser.add_argument("-o", "--output", help="output folder (default Converted_<Hz>Hz_<date>)")
+    parser.add_argument("--existing", choices=["skip", "overwrite"], default="skip",
+                        help="what to do when the output file already exists")
+    parser.add_argument("--near-target", choices=["copy", "skip", "convert"], default="copy",
+                        help="what to do with files already close to the target tuning "
+                             f"(within {NEAR_TARGET_CENTS:g} cents): copy them unchanged, skip or convert")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--input-formats", default="mp3,wav,flac", help="comma separated input extensions")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="scan folders recursively, mirror their tree and skip files converted before")
+    parser.add_argument("--streaming", action="store_true", help="use the in-process streaming pipeline")
+    parser.add_argument("--pitch-backend", choices=["rubberband", "vocoder"], default=PITCH_BACKEND,
+                        help="pitch shifter of the WAV pipeline: Rubberband CLI or the built-in phase vocoder")
+    parser.add_argument("--vocoder-preset", choices=sorted(OFFLINE_PRESETS), default=VOCODER_PRESET,
+                        help="quality/speed of the built-in vocoder")
+    parser.add_argument("--no-cache", action="store_true", help="disable the conversion cache")
+    parser.add_argument("--scratch-dir", help="folder for temp WAVs, e.g. /dev/shm or a fast local disk")
+    args = parser.parse_args(argv)
+
+    if not all(20 <= hz <= 20000 for hz in args.target_hz):
+        parser.error("target Hz must be between 20 and 20000")
+    # 432.0 -> 432, zodat bestandsnamen gelijk zijn aan die uit het menu
+    targets = list(dict.fromkeys(int(hz) if hz.is_integer() else hz for hz in args.target_hz))
+    output_exts = list(dict.fromkeys("." + fmt for fmt in args.format))
+    if args.streaming:
+        STREAMING_PIPELINE = True
+    PITCH_BACKEND, VOCODER_PRESET = args.pitch_backend, args.vocoder_preset
+    if args.no_cache:
+        CACHE_ENABLED = False
+    if args.scratch_dir:
+        SCRATCH_DIR = args.scratch_dir
+
+    allowed_inputs = tuple("." + ext.strip().lstrip(".") for ext in args.input_formats.split(",") if ext.strip())
+    results = convert_files(
+        args.inputs, targets if len(targets) > 1 else targets[0],
+        output_ext=output_exts if len(output_exts) > 1 else output_exts[0],
+        output_folder=args.output,
+        quality=args.quality,
+        overwrite=args.existing == "overwrite",
+        near_target=args.near_target,
+        workers=args.workers,
+        allowed_inputs=allowed_inputs,
+        recursive=args.recursive,
+    )
+    if not results:
+        return 1
+    return 1 if any(r["status"] in ("invalid", "failed") for r in results) else 0
 
 # -------------------------
 #   Startpunt
 # -------------------------
 if __name__ == "__main__":
+    # ------------------------
+    #   Met argumenten: non-interactieve CLI
+    # ------------------------
+    if len(sys.argv) > 1:
+        sys.exit(main_cli())
+
     # ------------------------
     #   Database runnen
     # ------------------------
+    exit_on_sigterm()
     init_database()
+    unfinished = [job for job in list_batch_jobs() if job[2] != "done"]
+    if unfinished:
+        print(f"⚠️ {len(unfinished)} interrupted batch job(s) found. Use 'Resume interrupted batch' to continue.")
 
     # ------------------------
     #   Main Menu
@@ -353,7 +3138,9 @@ if __name__ == "__main__":
         print("\n=== MAIN MENU ===")
         print("1 = Convert audio")
         print("2 = View conversion history")
-        print("3 = Exit")
+        print("3 = Conversion statistics")
+        print("4 = Resume interrupted batch")
+        print("5 = Exit")
 
         menu_choice = input("Choose an option: ").strip()
 
@@ -428,29 +3215,47 @@ if __name__ == "__main__":
 
             #   Single Mode
             if mode == "s":
+                if not check_tools([output_ext]):
+                    continue
                 input_path = input("Input file path to convert: ").strip()  # C:\Music\440hz_geluid.mp3
 
-                if not validate_audio_file(input_path):
+                try:
+                    ingest = ingest_audio(input_path)
+                except OSError as e:
+                    print(f"❌ Error: {e}")
+                    continue
+                if ingest is None:
                     continue
 
-                sample_wav = extract_sample(input_path)
-                detected_hz = estimate_tuning(sample_wav)
-                os.remove(sample_wav)
+                try:
+                    detected_hz, confidence = sample_tuning(input_path, ingest)
 
-                print(f"Detected approximate tuning: {detected_hz:.2f} Hz")
+                    print(f"Detected tuning reference: {detected_hz:.2f} Hz (confidence {confidence:.2f})")
 
-                if abs(detected_hz - target_hz) < 1.0:
-                    proceed = input("Do you still want to convert? (y/n): ").strip().lower()
-                    if proceed != "y":
+                    action = near_target_action(detected_hz, confidence, target_hz, "ask")
+                    if action == "skip":
                         print("Conversion canceled.")
                         continue
 
-                name = input(
-                    "Output file name (without extension): ").strip()  # Geluid_432Hz.mp3  of  Geluid_528Hz.mp3
-                output_path = os.path.join(output_folder, name + output_ext)
-                convert_audio_440_to_target(input_path, output_path, target_hz)
-                save_conversion_to_db(input_path, output_path, detected_hz, target_hz)
-                print("✅ Conversion complete.")
+                    name = input(
+                        "Output file name (without extension): ").strip()  # Geluid_432Hz.mp3  of  Geluid_528Hz.mp3
+                    output_path = os.path.join(output_folder, name + output_ext)
+                    stats = {"shift_cents": target_shift_cents(detected_hz, target_hz)}
+                    if action == "copy":
+                        result = {"input_path": input_path, "output_path": None, "detected_hz": detected_hz,
+                                  "target_hz": target_hz, "status": "failed", "error": None, "stats": stats}
+                        copy_result(result, input_path, output_path, None)
+                        save_conversions_to_db([result_row(result)])
+                        if result["status"] == "copied":
+                            print("✅ Copied unchanged, already at target tuning.")
+                        continue
+                    if convert_audio_440_to_target(input_path, output_path, target_hz, ingest=ingest, stats=stats):
+                        save_conversion_to_db(input_path, output_path, detected_hz, target_hz, stats)
+                        print("✅ Conversion complete.")
+                    else:
+                        save_conversion_to_db(input_path, None, detected_hz, target_hz, stats, status="failed")
+                finally:
+                    close_ingest(ingest)
 
             #   Batch Mode
             elif mode == "b":
@@ -458,18 +3263,31 @@ if __name__ == "__main__":
                 if not os.path.exists(folder_path):
                     print("Folder does not exist!")
                     continue
-                file_list = [
-                    os.path.join(folder_path, f)
-                    for f in os.listdir(folder_path)
-                    if f.lower().endswith(allowed_inputs)
-                ]
-                if not file_list:
+                folder_path = os.path.abspath(folder_path)
+                recursive = input("Include subfolders (mirrored in the output folder)? (y/n): ").strip().lower()
+                recursive = recursive == "y"
+                skip_converted = input("Skip files already converted with these settings? (y/n): ").strip().lower()
+                skip_converted = skip_converted == "y"
+                files = iter_files_to_convert(folder_path, target_hz, output_ext, allowed_inputs, recursive,
+                                              exclude=[output_folder], skip_converted=skip_converted)
+                first = next(files, None)
+                if first is None:
                     print("No audio files found in folder.")
                     continue
 
-                print(f"Found {len(file_list)} files. Starting batch conversion...")
-                batch_convert_files(file_list, target_hz, output_folder, output_ext)
-                print("\n✅ Batch conversion complete.")
+                workers_input = input(f"Number of parallel workers (Enter = {DEFAULT_WORKERS}): ").strip()
+                try:
+                    workers = int(workers_input) if workers_input else DEFAULT_WORKERS
+                except ValueError:
+                    print("Invalid input!")
+                    continue
+
+                # Recursief: lazy (een resume scant de boom opnieuw); 1 map: direct de hele lijst in de job
+                file_list = chain([first], files) if recursive else [first] + list(files)
+                print("Starting batch conversion...")
+                batch_convert_files(file_list, target_hz, output_folder, output_ext, workers=workers,
+                                    source_root=folder_path if recursive else None,
+                                    input_formats=list(allowed_inputs))
 
             else:
                 print("Invalid mode.")
@@ -478,6 +3296,22 @@ if __name__ == "__main__":
         elif menu_choice == "2":
             show_history_menu()
         elif menu_choice == "3":
+            print_statistics(conversion_statistics())
+            input("\nPress Enter to continue...")
+        elif menu_choice == "4":
+            jobs = [job for job in list_batch_jobs() if job[2] != "done"]
+            if not jobs:
+                print("No interrupted batch jobs.")
+                continue
+            print_batch_jobs(jobs)
+            job_input = input("Job to resume (Enter = latest): ").strip()
+            try:
+                workers = int(input(f"Number of parallel workers (Enter = {DEFAULT_WORKERS}): ").strip()
+                              or DEFAULT_WORKERS)
+                resume_batch_job(int(job_input) if job_input else None, workers=workers)
+            except ValueError:
+                print("Invalid input!")
+        elif menu_choice == "5":
             print("Exiting program.")
             exit()
         else:
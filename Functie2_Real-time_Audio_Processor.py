@@ -1,9 +1,8 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog
 import sounddevice as sd
-import numpy as np
-import pyrubberband as rb
-import time
+from datetime import datetime
+from Realtime_DSP_Core import RealtimeProcessor
 
 #######################
 # GLOBAL VARS
@@ -11,9 +10,16 @@ import time
 running = False
 stream = None
 pitch_ratio = 432 / 440
-latency_ms = 0
 blocksize = 512  # buffer size
 samplerate = 44100  # vaste sample rate voor VB-Cable + Speakers
+channels = 2  # stereo in en uit, elk kanaal apart geshift
+fft_size = 1024  # phase vocoder frame; latency = fft_size - fft_size / overlap
+overlap = 4
+lookahead_blocks = 2  # buffer tussen callback en DSP worker; extra latency = lookahead_blocks * blocksize
+
+# DSP core (callback + ring buffers + worker), zie Realtime_DSP_Core.py
+processor = RealtimeProcessor(pitch_ratio, blocksize=blocksize, samplerate=samplerate, channels=channels,
+                              fft_size=fft_size, overlap=overlap, lookahead_blocks=lookahead_blocks)
 
 # Device indices (Windows WASAPI)
 input_idx = None
@@ -29,35 +35,6 @@ for i, dev in enumerate(sd.query_devices()):
 if input_idx is None or output_idx is None:
     raise RuntimeError("❌ Kan input of output device niet vinden.")
 
-#######################
-# DSP CALLBACK
-#######################
-def audio_callback(indata, outdata, frames, time_info, status):
-    global pitch_ratio, latency_ms
-    start = time.time()
-
-    if status:
-        if 'input overflow' in str(status).lower():
-            pass # negeer input overflow
-        else:
-            print(status)
-
-    # Stereo -> mono
-    audio = np.mean(indata, axis=1).astype(np.float32)
-
-    try:
-        shifted = rb.pitch_shift(audio, samplerate, pitch_ratio)
-    except Exception as e:
-        print("❌ Rubberband error:", e)
-        shifted = audio
-
-    # Mono -> stereo
-    shifted = np.repeat(shifted[:, np.newaxis], 2, axis=1)
-    outdata[:len(outdata)] = shifted
-
-    # Callback latency
-    latency_ms = (time.time() - start) * 1000
-
 #######################
 # AUDIO CONTROL
 #######################
@@ -83,20 +60,25 @@ def start_processing():
             running = False
             return
 
+    # Shifter, buffers en stats resetten en de DSP worker starten
+    processor.reset(pitch_ratio)
+    processor.start()
+
     # Open stream
     try:
         stream = sd.Stream(
             device=(input_idx, output_idx),
             samplerate=samplerate,
             blocksize=blocksize,
-            channels=(1, 2),
+            channels=(channels, channels),
             dtype='float32',
-            callback=audio_callback
+            callback=processor.audio_callback
         )
         stream.start()
     except Exception as e:
         status_label.config(text=f"❌ Stream error: {e}")
         running = False
+        processor.stop()
         return
 
     # Disable controls tijdens DSP
@@ -117,6 +99,8 @@ def stop_processing():
             print("❌ Error closing stream:", e)
         stream = None
 
+    processor.stop()
+
     # Enable controls na stop
     tuning_choice.config(state="normal")
     custom_entry.config(state="normal")
@@ -129,7 +113,7 @@ def stop_processing():
 root = tk.Tk()
 root.configure(bg="#1e1e1e")
 root.title("Real-Time Pitch Shift DSP")
-root.geometry("480x400")
+root.geometry("560x460")
 root.resizable(False, False)
 
 style = ttk.Style()
@@ -153,11 +137,37 @@ toggle_btn.pack(pady=20)
 status_label = tk.Label(root, text="⛔ Stopped", font=("Arial", 14))
 status_label.pack(pady=10)
 
-latency_label = tk.Label(root, text="Latency: 0 ms", font=("Arial", 12))
+latency_label = tk.Label(root, text="DSP: -", font=("Arial", 12))
 latency_label.pack()
 
+callback_label = tk.Label(root, text="Callback: -", font=("Arial", 10))
+callback_label.pack()
+
+buffer_label = tk.Label(root, text="Buffers: in 0 / out 0", font=("Arial", 10))
+buffer_label.pack(pady=5)
+
+def export_stats_dialog():
+    path = filedialog.asksaveasfilename(
+        defaultextension=".json",
+        initialfile=f"dsp_stats_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.json",
+        filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+    if path:
+        processor.export_stats(path)
+
+tk.Button(root, text="Export stats", command=export_stats_dialog,
+          font=("Arial", 10), bg="#2b2b2b", fg="white").pack(pady=5)
+
+def format_stats(name, stats):
+    return (f"{name}: p50 {stats['p50_ms']:.2f} / p99 {stats['p99_ms']:.2f} / max {stats['max_ms']:.2f} ms"
+            f" ({stats['budget_ratio_p99'] * 100:.0f}% of {stats['budget_ms']:.1f} ms,"
+            f" {stats['deadline_misses']} misses)")
+
 def update_latency_label():
-    latency_label.config(text=f"Latency: {latency_ms:.1f} ms")
+    latency_label.config(text=format_stats("DSP", processor.dsp_stats.summary()))
+    callback_label.config(text=format_stats("Callback", processor.callback_stats.summary()))
+    buffer_label.config(text=f"Buffers: in {processor.input_ring.fill()} / out {processor.output_ring.fill()} frames"
+                             f" | underruns {processor.underruns}, overruns {processor.overruns},"
+                             f" xruns {processor.xruns()}")
     root.after(100, update_latency_label)
 
 update_latency_label()
@@ -0,0 +1,367 @@
+#Pitch Shift Engine - in-process phase vocoder (gedeeld door Functie 1 en 2)
+import math
+import numpy as np
+
+# numpy >= 2.0 kan FFT's direct in een bestaande buffer schrijven
+_FFT_HAS_OUT = np.lib.NumpyVersion(np.__version__) >= "2.0.0"
+
+
+#   --------------------
+#   Streaming pitch shifter
+#   --------------------
+class StreamingPitchShifter:
+    """
+    Stateful phase-vocoder pitch shifter for block-wise streaming.
+
+    Blocks of any size go in and the same number of frames come out, delayed
+    by `latency` frames. Phase and overlap-add state is kept between calls,
+    so there are no clicks at block boundaries. All work buffers are
+    allocated up front.
+    """
+
+    def __init__(self, ratio, channels=1, fft_size=2048, overlap=4):
+        if fft_size % overlap:
+            raise ValueError("fft_size must be a multiple of overlap")
+        self.channels = channels
+        self.fft_size = fft_size
+        self.overlap = overlap
+        self.hop = fft_size // overlap
+        self.latency = fft_size - self.hop
+
+        bins = fft_size // 2 + 1
+        shape = (channels, bins)
+        # Constanten per kanaal uitgeschreven: in-place ufuncs met een
+        # gebroadcaste 1-D operand alloceren een tijdelijke buffer
+        self._bin_index = np.arange(bins, dtype=np.float64)
+        self._bins = np.tile(self._bin_index, (channels, 1))
+        self._expected = 2 * np.pi * self.hop * self._bins / fft_size
+        self._window = np.tile(np.hanning(fft_size + 1)[:-1], (channels, 1))
+        # Hann analysis + synthesis window: sum of w^2 over the overlaps
+        self._ola_scale = 1.0 / (0.375 * overlap)
+
+        # Input FIFO (double buffered, zodat schuiven niet overlapt)
+        self._in_fifo = np.zeros((channels, fft_size))
+        self._in_spare = np.zeros((channels, fft_size))
+        self._out_fifo = np.zeros((channels, self.hop))
+        self._accum = np.zeros((channels, fft_size))
+        self._accum_pos = 0
+        self._rover = self.latency
+
+        self._frame = np.zeros((channels, fft_size))
+        self._spectrum = np.zeros(shape, dtype=np.complex128)
+        self._mag = np.zeros(shape)
+        self._phase = np.zeros(shape)
+        self._last_phase = np.zeros(shape)
+        self._sum_phase = np.zeros(shape)
+        self._freq = np.zeros(shape)
+        self._synth_mag = np.zeros(shape)
+        self._synth_freq = np.zeros(shape)
+        self._tmp = np.zeros(shape)
+        self._tmp2 = np.zeros(shape)
+
+        self._src_idx = np.zeros(bins, dtype=np.intp)
+        self._src_valid = np.zeros(shape)
+        self.set_ratio(ratio)
+
+    def set_ratio(self, ratio):
+        """Change the pitch ratio (target / source frequency)."""
+        self.ratio = float(ratio)
+        bins = len(self._bin_index)
+        src = np.rint(self._bin_index / self.ratio)
+        self._src_valid[:] = src < bins
+        self._src_idx[:] = np.minimum(src, bins - 1)
+
+    def reset(self):
+        """Clear all streaming state (phases, FIFOs, overlap-add buffer)."""
+        for buf in (self._in_fifo, self._out_fifo, self._accum,
+                    self._last_phase, self._sum_phase):
+            buf.fill(0.0)
+        self._accum_pos = 0
+        self._rover = self.latency
+
+    def process(self, block, out=None):
+        """
+        Pitch shift one block of shape (frames, channels), or (frames,) for mono.
+
+        Writes into `out` when given (same shape as block) and returns it.
+        """
+        if out is None:
+            out = np.empty_like(block)
+        mono = block.ndim == 1
+        n = len(block)
+        pos = 0
+        while pos < n:
+            take = min(self.fft_size - self._rover, n - pos)
+            read = self._rover - self.latency
+            if mono:
+                self._in_fifo[0, self._rover:self._rover + take] = block[pos:pos + take]
+                out[pos:pos + take] = self._out_fifo[0, read:read + take]
+            else:
+                self._in_fifo[:, self._rover:self._rover + take] = block[pos:pos + take].T
+                out[pos:pos + take] = self._out_fifo[:, read:read + take].T
+            self._rover += take
+            pos += take
+            if self._rover >= self.fft_size:
+                self._process_frame()
+                self._rover = self.latency
+        return out
+
+    def _process_frame(self):
+        n, hop, two_pi = self.fft_size, self.hop, 2 * np.pi
+        spec, tmp, tmp2 = self._spectrum, self._tmp, self._tmp2
+
+        # Analyse
+        np.multiply(self._in_fifo, self._window, out=self._frame)
+        if _FFT_HAS_OUT:
+            np.fft.rfft(self._frame, axis=-1, out=spec)
+        else:
+            spec[...] = np.fft.rfft(self._frame, axis=-1)
+        np.abs(spec, out=self._mag)
+        np.arctan2(spec.imag, spec.real, out=self._phase)
+
+        # Fase-verschil -> echte frequentie per bin (in bins)
+        np.subtract(self._phase, self._last_phase, out=tmp)
+        self._last_phase[...] = self._phase
+        tmp -= self._expected
+        np.divide(tmp, two_pi, out=tmp2)
+        np.rint(tmp2, out=tmp2)
+        tmp2 *= two_pi
+        tmp -= tmp2
+        np.multiply(tmp, self.overlap / two_pi, out=self._freq)
+        self._freq += self._bins
+
+        # Pitch shift: elke doel-bin haalt zijn bron-bin op
+        np.take(self._mag, self._src_idx, axis=-1, out=self._synth_mag, mode="clip")
+        self._synth_mag *= self._src_valid
+        np.take(self._freq, self._src_idx, axis=-1, out=self._synth_freq, mode="clip")
+        self._synth_freq *= self.ratio
+
+        # Synthese
+        np.subtract(self._synth_freq, self._bins, out=tmp)
+        tmp *= two_pi / self.overlap
+        tmp += self._expected
+        self._sum_phase += tmp
+        np.cos(self._sum_phase, out=tmp)
+        np.multiply(self._synth_mag, tmp, out=spec.real)
+        np.sin(self._sum_phase, out=tmp)
+        np.multiply(self._synth_mag, tmp, out=spec.imag)
+        if _FFT_HAS_OUT:
+            np.fft.irfft(spec, n=n, axis=-1, out=self._frame)
+        else:
+            self._frame[...] = np.fft.irfft(spec, n=n, axis=-1)
+        self._frame *= self._window
+        self._frame *= self._ola_scale
+
+        # Overlap-add in een ringbuffer
+        p = self._accum_pos
+        self._accum[:, p:] += self._frame[:, :n - p]
+        self._accum[:, :p] += self._frame[:, n - p:]
+        self._out_fifo[...] = self._accum[:, p:p + hop]
+        self._accum[:, p:p + hop] = 0.0
+        self._accum_pos = (p + hop) % n
+
+        # Input FIFO een hop opschuiven
+        self._in_spare[:, :self.latency] = self._in_fifo[:, hop:]
+        self._in_fifo, self._in_spare = self._in_spare, self._in_fifo
+
+
+#   --------------------
+#   Offline pitch shifter (hele bestanden)
+#   --------------------
+# Kwaliteit/snelheid presets: FFT grootte, overlap en resample filter lengte (taps per kant)
+OFFLINE_PRESETS = {
+    "fast": {"fft_size": 2048, "overlap": 4, "taps": 8},
+    "balanced": {"fft_size": 4096, "overlap": 4, "taps": 16},
+    "high": {"fft_size": 4096, "overlap": 8, "taps": 32},
+}
+RESAMPLE_PHASES = 512  # getabelleerde sinc kernels per sample
+
+class OfflinePitchShifter:
+    """
+    Phase-vocoder pitch shifter for whole files, vectorized over frames.
+
+    The audio is time-stretched by the pitch ratio with identity phase
+    locking (every bin keeps its phase offset to the nearest spectral
+    peak, which keeps partials coherent) and then resampled back to its
+    original length with a windowed-sinc interpolator. Blocks of any size
+    go in; all frames a block completes are processed in one go. The
+    output is aligned with the input and, after flush(), exactly as long.
+    """
+
+    def __init__(self, ratio, channels=1, fft_size=4096, overlap=4, taps=16, phase_lock=True):
+        if fft_size % overlap:
+            raise ValueError("fft_size must be a multiple of overlap")
+        self.ratio = float(ratio)
+        self.channels = channels
+        self.fft_size = fft_size
+        self.overlap = overlap
+        self.hop = fft_size // overlap  # synthese hop
+        self.analysis_hop = self.hop / self.ratio
+        self.taps = taps
+        self.phase_lock = phase_lock
+
+        bins = fft_size // 2 + 1
+        self._bin_index = np.arange(bins)
+        self._omega = 2 * np.pi * self._bin_index / fft_size
+        self._window = np.hanning(fft_size + 1)[:-1]
+        # Hann analysis + synthesis window: sum of w^2 over the overlaps
+        self._ola_scale = 1.0 / (0.375 * overlap)
+        # Resampler: windowed-sinc kernels (Blackman) voor RESAMPLE_PHASES
+        # fracties, met anti-aliasing bij omlaag samplen (ratio > 1)
+        cutoff = min(1.0, 1.0 / self.ratio)
+        self._tap_offsets = np.arange(2 * taps)
+        d = (np.arange(RESAMPLE_PHASES + 1) / RESAMPLE_PHASES)[:, None] + (taps - 1) - self._tap_offsets
+        kernels = cutoff * np.sinc(cutoff * d)
+        kernels *= 0.42 + 0.5 * np.cos(np.pi * d / taps) + 0.08 * np.cos(2 * np.pi * d / taps)
+        kernels /= kernels.sum(axis=1, keepdims=True)
+        self._kernels = kernels
+        self._kernel_steps = np.diff(kernels, axis=0)
+
+        # Stretch state; input en output met fft_size / 2 nullen ervoor,
+        # zodat het eerste frame op sample 0 gecentreerd is
+        half = fft_size // 2
+        self._x = np.zeros((half, channels))
+        self._x_start = 0
+        self._next_frame = 0
+        self._last_start = None
+        self._last_phase = None
+        self._sum_phase = None
+        self._accum = np.zeros((fft_size - self.hop, channels))
+        self._frames_in = 0
+
+        # Resample state
+        self._y = np.zeros((0, channels))
+        self._y_start = 0
+        self._out_pos = 0
+
+    def _frame_start(self, m):
+        return int(np.rint(m * self.analysis_hop))
+
+    def process(self, block):
+        """Feed a (frames, channels) block; returns the output frames that are ready."""
+        block = np.asarray(block, dtype=np.float64).reshape(len(block), self.channels)
+        self._frames_in += len(block)
+        self._x = np.concatenate((self._x, block))
+        self._y = np.concatenate((self._y, self._stretch()))
+        return self._resample(final=False)
+
+    def flush(self):
+        """Process the remaining input and return the last output frames."""
+        n = self.fft_size
+        self._x = np.concatenate((self._x, np.zeros((n, self.channels))))
+        tail = [self._y, self._stretch(), self._accum, np.zeros((self.taps, self.channels))]
+        self._accum = np.zeros_like(self._accum)
+        self._y = np.concatenate(tail)
+        out = self._resample(final=True)
+        missing = self._frames_in - self._out_pos
+        if missing > 0:
+            out = np.concatenate((out, np.zeros((missing, self.channels))))
+            self._out_pos += missing
+        return out
+
+    def _stretch(self):
+        n, hop = self.fft_size, self.hop
+        x_end = self._x_start + len(self._x)
+        m_hi = self._next_frame
+        while self._frame_start(m_hi) + n <= x_end:
+            m_hi += 1
+        count = m_hi - self._next_frame
+        if count == 0:
+            return np.zeros((0, self.channels))
+
+        # Alle frames van dit blok in een keer: (frames, channels, fft_size)
+        starts = np.rint(np.arange(self._next_frame, m_hi) * self.analysis_hop).astype(np.intp)
+        idx = (starts - self._x_start)[:, None] + np.arange(n)
+        frames = self._x[idx].transpose(0, 2, 1) * self._window
+        spec = np.fft.rfft(frames, axis=-1)
+        mag = np.abs(spec)
+        phase = np.angle(spec)
+
+        # Echte frequentie per bin uit het fase-verschil met het vorige frame
+        first = self._last_phase is None
+        prev_phase = np.concatenate(((phase[0] if first else self._last_phase)[None], phase[:-1]))
+        prev_start = starts[0] - 1 if first else self._last_start
+        hops = np.diff(np.concatenate(([prev_start], starts))).astype(np.float64)[:, None, None]
+        deviation = phase - prev_phase - self._omega * hops
+        deviation -= 2 * np.pi * np.rint(deviation / (2 * np.pi))
+        increment = (self._omega + deviation / hops) * hop
+        start_phase = phase[0] - increment[0] if first else self._sum_phase
+        synth_phase = start_phase + np.cumsum(increment, axis=0)
+        self._sum_phase = np.mod(synth_phase[-1], 2 * np.pi)
+        self._last_phase = phase[-1]
+        self._last_start = starts[-1]
+
+        if self.phase_lock:
+            synth_phase = self._lock_phases(mag, phase, synth_phase)
+
+        # Synthese en overlap-add, gevectoriseerd over de frames
+        out_frames = np.fft.irfft(mag * np.exp(1j * synth_phase), n=n, axis=-1)
+        out_frames *= self._window
+        out_frames *= self._ola_scale
+        acc = np.zeros(((count + self.overlap - 1) * hop, self.channels))
+        acc[:len(self._accum)] += self._accum
+        for j in range(self.overlap):
+            part = out_frames[:, :, j * hop:(j + 1) * hop].transpose(0, 2, 1).reshape(count * hop, self.channels)
+            acc[j * hop:j * hop + count * hop] += part
+        self._accum = acc[count * hop:]
+
+        # Verbruikte input loslaten
+        self._next_frame = m_hi
+        keep = self._frame_start(m_hi) - self._x_start
+        self._x = self._x[keep:]
+        self._x_start += keep
+        return acc[:count * hop]
+
+    def _lock_phases(self, mag, phase, synth_phase):
+        """Identity phase locking: every bin follows the phase of its nearest peak."""
+        bins = len(self._bin_index)
+        padded = np.pad(mag, [(0, 0), (0, 0), (2, 2)])
+        is_peak = ((mag >= padded[..., :-4]) & (mag >= padded[..., 1:-3])
+                   & (mag > padded[..., 3:-1]) & (mag > padded[..., 4:]))
+        k = self._bin_index
+        prev_peak = np.maximum.accumulate(np.where(is_peak, k, -1), axis=-1)
+        next_peak = np.minimum.accumulate(np.where(is_peak, k, bins)[..., ::-1], axis=-1)[..., ::-1]
+        use_next = (prev_peak < 0) | ((next_peak < bins) & (next_peak - k < k - prev_peak))
+        peak = np.where(use_next, next_peak, prev_peak)
+        peak = np.where((peak < 0) | (peak >= bins), k, peak)  # frame zonder pieken
+        return (np.take_along_axis(synth_phase, peak, axis=-1)
+                + phase - np.take_along_axis(phase, peak, axis=-1))
+
+    def _resample(self, final):
+        # out[j] = y(j * ratio); y heeft fft_size / 2 samples voorloop
+        taps, half = self.taps, self.fft_size // 2
+        y_end = self._y_start + len(self._y)
+        # Laatste output waarvoor alle taps beschikbaar zijn
+        last = int(np.floor((y_end - taps - half) / self.ratio))
+        while last >= 0 and int(np.floor(last * self.ratio + half)) + taps >= y_end:
+            last -= 1
+        last = min(last, self._frames_in - 1)
+        count = last + 1 - self._out_pos
+        if count <= 0:
+            return np.zeros((0, self.channels))
+
+        out = np.empty((count, self.channels))
+        for pos in range(0, count, 8192):
+            j = np.arange(self._out_pos + pos, self._out_pos + min(count, pos + 8192))
+            p = j * self.ratio + half
+            base = np.floor(p).astype(np.intp)
+            # Kernel voor de fractie: lineair tussen de twee dichtstbijzijnde tabel kernels
+            phase = (p - base) * RESAMPLE_PHASES
+            row = phase.astype(np.intp)
+            step = self._kernel_steps[np.minimum(row, RESAMPLE_PHASES - 1)]
+            kernel = self._kernels[row] + (phase - row)[:, None] * step
+            idx = (base - taps + 1 - self._y_start)[:, None] + self._tap_offsets
+            out[pos:pos + len(j)] = np.einsum("jk,jkc->jc", kernel, self._y[idx])
+        self._out_pos += count
+
+        # Verbruikte output van de stretch loslaten
+        keep = int(np.floor(self._out_pos * self.ratio + half)) - taps + 1 - self._y_start
+        if keep > 0 and not final:
+            self._y = self._y[keep:]
+            self._y_start += keep
+        return out
+
+
+def semitones_to_ratio(semitones):
+    """Convert a shift in semitones to a frequency ratio."""
+    return math.pow(2.0, semitones / 12.0)
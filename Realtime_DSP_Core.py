@@ -0,0 +1,295 @@
+#Realtime DSP Core - callback, ring buffers en DSP worker van Functie 2, zonder GUI of audio devices
+import csv
+import json
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from Pitch_Shift_Engine import StreamingPitchShifter
+
+
+#######################
+# RING BUFFER
+#######################
+class RingBuffer:
+    """
+    Single-producer/single-consumer ring buffer of audio frames, NumPy-backed.
+
+    The producer only moves the write counter and the consumer only moves
+    the read counter, so neither side takes a lock. Counters only grow;
+    fill level is their difference.
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self._buf = np.zeros((capacity, channels), dtype=np.float32)
+        self._write = 0
+        self._read = 0
+
+    def fill(self):
+        return self._write - self._read
+
+    def space(self):
+        return self.capacity - self.fill()
+
+    def write(self, data):
+        """Copy as many frames of data as fit; returns the number written."""
+        n = min(len(data), self.space())
+        pos = self._write % self.capacity
+        first = min(n, self.capacity - pos)
+        self._buf[pos:pos + first] = data[:first]
+        self._buf[:n - first] = data[first:n]
+        self._write += n  # pas na de copy zichtbaar voor de consumer
+        return n
+
+    def read(self, out):
+        """Fill out with as many frames as available; returns the number read."""
+        n = min(len(out), self.fill())
+        pos = self._read % self.capacity
+        first = min(n, self.capacity - pos)
+        out[:first] = self._buf[pos:pos + first]
+        out[first:n] = self._buf[:n - first]
+        self._read += n
+        return n
+
+    def reset(self):
+        """Empty the buffer. Only call while neither side is running."""
+        self._write = 0
+        self._read = 0
+
+
+#######################
+# PERFORMANCE STATS
+#######################
+class PerfStats:
+    """
+    Rolling window of per-block processing times (perf_counter_ns) with a
+    deadline-miss counter. record() only writes into a preallocated array,
+    so it is safe to call from the audio callback.
+    """
+
+    def __init__(self, budget_ms, size=4096):
+        self._times = np.zeros(size, dtype=np.int64)
+        self.reset(budget_ms)
+
+    def reset(self, budget_ms):
+        self.budget_ms = budget_ms
+        self._budget_ns = int(budget_ms * 1e6)
+        self.count = 0
+        self.deadline_misses = 0
+
+    def record(self, ns):
+        self._times[self.count % len(self._times)] = ns
+        self.count += 1
+        if ns > self._budget_ns:
+            self.deadline_misses += 1
+
+    def window_ms(self):
+        """Copy of the rolling window, in milliseconds."""
+        return self._times[:min(self.count, len(self._times))] / 1e6
+
+    def summary(self):
+        """p50/p99/max (ms), budget ratio of p99 and deadline misses."""
+        window = self.window_ms()
+        p50 = p99 = peak = 0.0
+        if len(window):
+            p50, p99 = np.percentile(window, [50, 99]).tolist()
+            peak = float(window.max())
+        return {
+            "blocks": self.count,
+            "p50_ms": p50,
+            "p99_ms": p99,
+            "max_ms": peak,
+            "budget_ms": self.budget_ms,
+            "budget_ratio_p99": p99 / self.budget_ms if self.budget_ms else 0.0,
+            "deadline_misses": self.deadline_misses,
+        }
+
+    def histogram(self, bins=20):
+        """Histogram of the rolling window: (counts, bin edges in ms)."""
+        window = self.window_ms()
+        if not len(window):
+            return [], []
+        counts, edges = np.histogram(window, bins=bins)
+        return counts.tolist(), edges.tolist()
+
+
+#######################
+# REALTIME PROCESSOR
+#######################
+class RealtimeProcessor:
+    """
+    Real-time pitch shift core. audio_callback only moves audio through the
+    ring buffers; process_available does the DSP and runs on a worker
+    thread (start/stop) or can be called directly to drive it offline.
+    """
+
+    def __init__(self, pitch_ratio=432 / 440, blocksize=512, samplerate=44100, channels=2,
+                 fft_size=1024, overlap=4, lookahead_blocks=2, ring_blocks=16):
+        self.blocksize = blocksize
+        self.samplerate = samplerate
+        self.channels = channels
+        self.fft_size = fft_size
+        self.overlap = overlap
+        self.lookahead_blocks = lookahead_blocks  # extra latency = lookahead_blocks * blocksize
+
+        # Alles 1x aangemaakt (geen allocaties in callback of worker)
+        self.shifter = StreamingPitchShifter(pitch_ratio, channels=channels, fft_size=fft_size, overlap=overlap)
+        self.input_ring = RingBuffer(blocksize * ring_blocks, channels)
+        self.output_ring = RingBuffer(blocksize * ring_blocks, channels)
+        self._work_in = np.zeros((blocksize, channels), dtype=np.float32)
+        self._work_out = np.zeros((blocksize, channels), dtype=np.float32)
+        self._silence = np.zeros((lookahead_blocks * blocksize, channels), dtype=np.float32)
+
+        # Timing per blok (budget = blocksize / samplerate) + PortAudio status flags
+        self.block_budget_ms = blocksize / samplerate * 1000
+        self.callback_stats = PerfStats(self.block_budget_ms)
+        self.dsp_stats = PerfStats(self.block_budget_ms)
+        self.status_counts = {"input_overflow": 0, "input_underflow": 0,
+                              "output_overflow": 0, "output_underflow": 0}
+        self.overruns = 0   # input ring vol: callback moest audio weggooien
+        self.underruns = 0  # output ring leeg: callback gaf stilte
+
+        self.running = False
+        self._thread = None
+        self.reset(pitch_ratio)
+
+    @property
+    def latency_frames(self):
+        """Total input-to-output delay: shifter latency plus lookahead."""
+        return self.shifter.latency + self.lookahead_blocks * self.blocksize
+
+    def reset(self, pitch_ratio=None):
+        """Clear shifter state, buffers and stats. Only call while stopped."""
+        if pitch_ratio is not None:
+            self.shifter.set_ratio(pitch_ratio)
+        self.shifter.reset()
+
+        # Ring buffers legen en de lookahead met stilte voorvullen
+        self.input_ring.reset()
+        self.output_ring.reset()
+        self.output_ring.write(self._silence)
+
+        self.overruns = self.underruns = 0
+        self.callback_stats.reset(self.block_budget_ms)
+        self.dsp_stats.reset(self.block_budget_ms)
+        for flag in self.status_counts:
+            self.status_counts[flag] = 0
+
+    #   Audio callback
+    def audio_callback(self, indata, outdata, frames, time_info, status):
+        """Only copies audio in and out of the ring buffers; all DSP runs in process_available."""
+        start = time.perf_counter_ns()
+
+        # Status flags tellen i.p.v. printen in de audio thread
+        if status:
+            for flag in self.status_counts:
+                if getattr(status, flag):
+                    self.status_counts[flag] += 1
+
+        if self.input_ring.write(indata) < frames:
+            self.overruns += 1
+
+        got = self.output_ring.read(outdata)
+        if got < frames:
+            outdata[got:] = 0.0
+            self.underruns += 1
+
+        self.callback_stats.record(time.perf_counter_ns() - start)
+
+    #   DSP worker
+    def process_available(self):
+        """
+        Pitch shift up to one block from input_ring into output_ring.
+        Returns the number of frames processed (0 if the input ring was empty).
+        """
+        work_in, work_out = self._work_in, self._work_out
+        n = self.input_ring.read(work_in)
+        if n == 0:
+            return 0
+        start = time.perf_counter_ns()
+
+        # Pitch shift per kanaal, stereobeeld blijft behouden
+        try:
+            self.shifter.process(work_in[:n], work_out[:n])
+        except Exception as e:
+            print("❌ Pitch shift error:", e)
+            work_out[:n] = work_in[:n]
+
+        # DSP tijd per blok (zonder wachten op de output ring)
+        self.dsp_stats.record(time.perf_counter_ns() - start)
+
+        # Wachten tot er plek is (alleen als de callback achterloopt)
+        written = self.output_ring.write(work_out[:n])
+        while self.running and written < n:
+            time.sleep(0.001)
+            written += self.output_ring.write(work_out[written:n])
+        return n
+
+    def _worker(self):
+        while self.running:
+            if not self.process_available():
+                time.sleep(0.001)
+
+    def start(self):
+        """Start the DSP worker thread."""
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the DSP worker thread and wait for it."""
+        self.running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    #   Stats export
+    def collect_stats(self):
+        """All timing, buffer and xrun data as one dict."""
+        callback_hist, callback_edges = self.callback_stats.histogram()
+        dsp_hist, dsp_edges = self.dsp_stats.histogram()
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "settings": {
+                "blocksize": self.blocksize,
+                "samplerate": self.samplerate,
+                "channels": self.channels,
+                "fft_size": self.fft_size,
+                "overlap": self.overlap,
+                "lookahead_blocks": self.lookahead_blocks,
+            },
+            "callback": dict(self.callback_stats.summary(), histogram=callback_hist,
+                             histogram_edges_ms=callback_edges),
+            "dsp": dict(self.dsp_stats.summary(), histogram=dsp_hist, histogram_edges_ms=dsp_edges),
+            "ring": {
+                "input_fill": self.input_ring.fill(),
+                "output_fill": self.output_ring.fill(),
+                "underruns": self.underruns,
+                "overruns": self.overruns,
+            },
+            "status_flags": dict(self.status_counts),
+        }
+
+    def xruns(self):
+        """PortAudio-reported xruns (input overflow + output underflow)."""
+        return self.status_counts["input_overflow"] + self.status_counts["output_underflow"]
+
+    def export_stats(self, path):
+        """Write collect_stats() to .json, or to .csv as section/metric/value rows."""
+        stats = self.collect_stats()
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["section", "metric", "value"])
+                writer.writerow(["", "timestamp", stats["timestamp"]])
+                for section in ("settings", "callback", "dsp", "ring", "status_flags"):
+                    for metric, value in stats[section].items():
+                        if isinstance(value, list):
+                            value = " ".join(f"{v:g}" for v in value)
+                        writer.writerow([section, metric, value])
+        else:
+            with open(path, "w") as f:
+                json.dump(stats, f, indent=2)